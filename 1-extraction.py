@@ -1,98 +1,306 @@
+import argparse
 import os
 import pathlib
-from docling.document_converter import DocumentConverter
+import time
+from urllib.parse import urlparse
 
-# Настройка локального кэша для HuggingFace моделей
-def setup_local_cache():
-    """
-    Настраивает локальное кэширование HuggingFace моделей.
-    Создает необходимые папки и устанавливает переменные окружения.
-    """
-    cache_dir = pathlib.Path("models_cache").absolute()
-    cache_dir.mkdir(exist_ok=True)
-    
-    # Настройка переменных окружения для HuggingFace
-    os.environ["HF_HOME"] = str(cache_dir)
-    os.environ["HUGGINGFACE_HUB_CACHE"] = str(cache_dir / "hub")
-    os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
-    
-    print(f"🔧 Настроен локальный кэш HuggingFace: {cache_dir}")
-    return cache_dir
+from utils.hf_cache import setup_local_cache
 
 # Инициализация локального кэша перед импортом библиотек
 cache_path = setup_local_cache()
 
 
-#from utils.sitemap import get_sitemap_urls
+def parse_args():
+    parser = argparse.ArgumentParser(description="Извлечение данных из документов")
+    parser.add_argument(
+        "source",
+        nargs="?",
+        default="documents/test_simple.pdf",
+        help="PDF файл, папка или glob-шаблон (например 'documents/**/*.pdf')",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Количество процессов для пакетной обработки (по умолчанию - число ядер)",
+    )
+    parser.add_argument(
+        "--output-dir",
+        default="extracted",
+        help="Папка для результатов пакетной обработки",
+    )
+    parser.add_argument(
+        "--window-pages",
+        type=int,
+        default=None,
+        help="Конвертировать большие PDF окнами по N страниц с записью каждого окна на диск",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=["auto", "fast", "balanced", "accurate"],
+        default="auto",
+        help="Профиль конвертации; auto отключает OCR для PDF с текстовым слоем",
+    )
+    parser.add_argument(
+        "--sitemap",
+        default=None,
+        help="URL сайта: конвертировать только новые и изменённые страницы из sitemap",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Не использовать кэш конвертации (conversion_cache/)",
+    )
+    return parser.parse_args()
 
-print("🤖 Инициализация DocumentConverter...")
-try:
-    converter = DocumentConverter()
-    print("✅ DocumentConverter успешно инициализирован!")
-except Exception as e:
-    print(f"❌ Ошибка инициализации DocumentConverter: {e}")
-    print("🔄 Попробуйте запустить скрипт с правами администратора или проверьте интернет-соединение")
-    exit(1)
 
 # --------------------------------------------------------------
 # Извлечение данных из локального документа пользователя
 # --------------------------------------------------------------
 
-print("🚀 Начинаю извлечение данных из документа...")
-
-# Проверка существования файла
-pdf_path = "documents/test_simple.pdf"
-
-if not os.path.exists(pdf_path):
-    print(f"❌ ОШИБКА: Файл не найден: {pdf_path}")
-    print("📁 Проверьте, что файл существует в папке documents/")
-    exit(1)
-
-print(f"📄 Файл найден: {pdf_path}")
-file_size = os.path.getsize(pdf_path) / (1024 * 1024)  # размер в MB
-print(f"📊 Размер файла: {file_size:.2f} MB")
-
-try:
-    print("🔄 Начинаю конвертацию PDF...")
-    result = converter.convert(pdf_path)
-    print("✅ Конвертация PDF завершена успешно!")
-    
-    print("🔄 Извлекаю содержимое документа...")
-    document = result.document
-    
-    if document is None:
-        print("❌ ОШИБКА: Документ не был обработан (document = None)")
+def print_conversion_report(report):
+    """
+    Печатает профиль конвертации и стоимость моделей на страницу
+    """
+    print(f"⚙️ Профиль: {report.profile}")
+    if report.pages:
+        print(f"📑 Страниц с текстовым слоем: {report.text_layer_pages} из {report.pages}")
+    if report.cached:
+        print("💾 Результат взят из кэша конвертации")
+        return
+
+    print(f"⏱️ Время конвертации: {report.seconds:.1f} с")
+    for name, seconds in sorted(report.page_timings.items(), key=lambda x: -x[1]):
+        print(f"   • {name}: {seconds * 1000:.0f} мс/стр.")
+
+
+def extract_single(pdf_path, use_cache=True, profile="auto"):
+    """
+    Извлекает один документ и сохраняет результат в extracted_content.md
+    """
+    from utils.conversion_cache import ConversionCache
+    from utils.conversion_server import remote_convert, server_available
+    from utils.profiles import convert_with_profile
+
+    # Сервер всегда пишет в кэш конвертации, поэтому при --no-cache конвертируем локально
+    use_server = use_cache and server_available()
+    if use_server:
+        # Модели уже загружены в сервере конвертации (python -m utils.conversion_server),
+        # профиль передаётся ему вместе с файлом
+        print("🌐 Использую запущенный сервер конвертации")
+
+    print("🚀 Начинаю извлечение данных из документа...")
+
+    # Проверка существования файла
+    if not os.path.exists(pdf_path):
+        print(f"❌ ОШИБКА: Файл не найден: {pdf_path}")
+        print("📁 Проверьте, что файл существует в папке documents/")
+        exit(1)
+
+    print(f"📄 Файл найден: {pdf_path}")
+    file_size = os.path.getsize(pdf_path) / (1024 * 1024)  # размер в MB
+    print(f"📊 Размер файла: {file_size:.2f} MB")
+
+    try:
+        print("🔄 Начинаю конвертацию PDF...")
+        if use_server:
+            document = remote_convert(pdf_path, profile=profile)
+            print(f"⚙️ Профиль: {profile}")
+        else:
+            # Неизменённый файл берётся из кэша без повторного запуска моделей
+            cache = ConversionCache() if use_cache else None
+            document, report = convert_with_profile(pdf_path, profile, cache)
+            print_conversion_report(report)
+        print("✅ Конвертация PDF завершена успешно!")
+
+        if document is None:
+            print("❌ ОШИБКА: Документ не был обработан (document = None)")
+            exit(1)
+
+        print("🔄 Экспортирую в markdown...")
+        markdown_output = document.export_to_markdown()
+
+        print("🔄 Экспортирую в JSON...")
+        json_output = document.export_to_dict()
+
+        print("✅ Документ успешно обработан!")
+        print("📄 Размер документа:", len(markdown_output), "символов")
+        print("\n" + "="*50)
+        print("ПРЕВЬЮ ИЗВЛЕЧЕННОГО ТЕКСТА:")
+        print("="*50)
+        print(markdown_output[:1000] + "...")
+
+    except Exception as e:
+        print(f"❌ ОШИБКА при обработке документа: {e}")
+        print(f"🔧 Тип ошибки: {type(e).__name__}")
+        import traceback
+        print("📋 Детали ошибки:")
+        traceback.print_exc()
         exit(1)
-    
-    print("🔄 Экспортирую в markdown...")
-    markdown_output = document.export_to_markdown()
-    
-    print("🔄 Экспортирую в JSON...")
-    json_output = document.export_to_dict()
-    
-    print("✅ Документ успешно обработан!")
-    print("📄 Размер документа:", len(markdown_output), "символов")
+
+    # --------------------------------------------------------------
+    # Сохранение результатов для проверки
+    # --------------------------------------------------------------
+
+    with open("extracted_content.md", "w", encoding="utf-8") as f:
+        f.write(markdown_output)
+
+    print("\n📁 Результат сохранен в файл: extracted_content.md")
+
+
+# --------------------------------------------------------------
+# Потоковое извлечение больших PDF окнами страниц
+# --------------------------------------------------------------
+
+def extract_streaming(pdf_path, output_dir, window_pages, profile="auto"):
+    """
+    Конвертирует PDF окнами по window_pages страниц, сохраняя каждое окно сразу на диск
+    """
+    from utils.profiles import choose_profile, get_converter
+    from utils.streaming import convert_in_windows, count_pages
+
+    total_pages = count_pages(pdf_path)
+    print(f"📄 Файл: {pdf_path} ({total_pages} страниц, окна по {window_pages})")
+
+    if profile == "auto":
+        profile, _ = choose_profile(pdf_path)
+    print(f"⚙️ Профиль: {profile}")
+    converter = get_converter(profile)
+    started = time.perf_counter()
+
+    for window in convert_in_windows(converter, pdf_path, output_dir, window_pages):
+        print(
+            f"✅ Страницы {window.first_page}-{window.last_page}: "
+            f"{window.seconds:.1f} с → {window.json_path}"
+        )
+
+    stem = pathlib.Path(pdf_path).stem
+    print(f"\n⏱️ Общее время: {time.perf_counter() - started:.1f} с")
+    print(f"📁 Полный markdown: {output_dir}/{stem}.md")
+
+
+# --------------------------------------------------------------
+# Пакетное извлечение (папка или glob-шаблон)
+# --------------------------------------------------------------
+
+def extract_batch(
+    sources, output_dir, workers, use_cache=True, window_pages=None, profile="auto"
+):
+    """
+    Параллельно конвертирует все документы: по одному DocumentConverter на процесс
+    """
+    from utils.batch import convert_batch
+
+    print(f"🚀 Пакетная обработка: {len(sources)} файлов → {output_dir}/")
+    started = time.perf_counter()
+    failed = []
+    stage_costs = {}
+
+    cache_dir = "conversion_cache" if use_cache else None
+    results = convert_batch(
+        sources, output_dir, workers, cache_dir, window_pages, profile
+    )
+    for i, item in enumerate(results, 1):
+        if item.ok:
+            print(
+                f"✅ [{i}/{len(sources)}] {item.source} - {item.seconds:.1f} с"
+                f" ({item.profile})"
+            )
+            for name, seconds in item.page_timings.items():
+                stage_costs.setdefault(name, []).append(seconds)
+        else:
+            print(f"❌ [{i}/{len(sources)}] {item.source} - {item.error}")
+            failed.append(item)
+
+    elapsed = time.perf_counter() - started
     print("\n" + "="*50)
-    print("ПРЕВЬЮ ИЗВЛЕЧЕННОГО ТЕКСТА:")
+    print("ИТОГИ ПАКЕТНОЙ ОБРАБОТКИ:")
     print("="*50)
-    print(markdown_output[:1000] + "...")
-    
-except Exception as e:
-    print(f"❌ ОШИБКА при обработке документа: {e}")
-    print(f"🔧 Тип ошибки: {type(e).__name__}")
-    import traceback
-    print("📋 Детали ошибки:")
-    traceback.print_exc()
-    exit(1)
+    print(f"📄 Успешно: {len(sources) - len(failed)} из {len(sources)}")
+    print(f"⏱️ Общее время: {elapsed:.1f} с ({len(sources) / elapsed:.2f} файлов/с)")
+    if stage_costs:
+        print("📊 Средняя стоимость моделей на страницу:")
+        for name, values in sorted(stage_costs.items(), key=lambda x: -sum(x[1])):
+            print(f"   • {name}: {sum(values) / len(values) * 1000:.0f} мс/стр.")
+    if failed:
+        print("❌ Ошибки:")
+        for item in failed:
+            print(f"   • {item.source}: {item.error}")
+
 
 # --------------------------------------------------------------
-# Сохранение результатов для проверки
+# Извлечение изменённых страниц сайта по sitemap
 # --------------------------------------------------------------
 
-with open("extracted_content.md", "w", encoding="utf-8") as f:
-    f.write(markdown_output)
-    
-print("\n📁 Результат сохранен в файл: extracted_content.md")
+def extract_sitemap(base_url, output_dir, state_path="sitemap_state.json"):
+    """
+    Конвертирует только страницы, изменившиеся с прошлого запуска
+    """
+    from docling.document_converter import DocumentConverter
+    from utils.sitemap import SitemapCrawler, get_sitemap_urls
+
+    print(f"🌐 Читаю sitemap: {base_url}")
+    # Состояние страницы сохраняется только после успешной конвертации,
+    # поэтому неудачные страницы попадут в следующий запуск снова
+    crawler = SitemapCrawler(state_path=state_path)
+    sitemap_urls = get_sitemap_urls(base_url, crawler=crawler)
+    print(f"🔄 Новых или изменённых страниц: {len(sitemap_urls)}")
+    if not sitemap_urls:
+        return
+
+    out = pathlib.Path(output_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    converter = DocumentConverter()
+    conv_results_iter = converter.convert_all(sitemap_urls, raises_on_error=False)
+    failed = 0
+    for url, result in zip(sitemap_urls, conv_results_iter):
+        if result.document:
+            # Имя файла из пути URL: /docs/usage/ → docs_usage.md
+            stem = urlparse(url).path.strip("/").replace("/", "_") or "index"
+            with open(out / f"{stem}.md", "w", encoding="utf-8") as f:
+                f.write(result.document.export_to_markdown())
+            crawler.record_page(url)
+            print(f"✅ {url}")
+        else:
+            failed += 1
+            print(f"❌ {url}: {result.status}")
+    if failed:
+        print(f"⚠️ Не сконвертировано страниц: {failed}, они будут повторены при следующем запуске")
+
+
+def main():
+    args = parse_args()
+
+    from utils.batch import collect_sources
+
+    if args.sitemap:
+        extract_sitemap(args.sitemap, args.output_dir)
+        return
+
+    if os.path.isfile(args.source):
+        if args.window_pages and args.source.lower().endswith(".pdf"):
+            extract_streaming(
+                args.source, args.output_dir, args.window_pages, profile=args.profile
+            )
+        else:
+            extract_single(args.source, use_cache=not args.no_cache, profile=args.profile)
+        return
+
+    sources = collect_sources(args.source)
+    if not sources:
+        print(f"❌ ОШИБКА: Не найдено документов по пути: {args.source}")
+        exit(1)
+
+    extract_batch(
+        sources,
+        args.output_dir,
+        args.workers,
+        use_cache=not args.no_cache,
+        window_pages=args.window_pages,
+        profile=args.profile,
+    )
+
 
 # --------------------------------------------------------------
 # Оригинальные примеры (закомментированы)
@@ -119,3 +327,7 @@ print("\n📁 Результат сохранен в файл: extracted_content
 #     if result.document:
 #         document = result.document
 #         docs.append(document)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import argparse
+import json
+import time
+from dataclasses import asdict
+
+from utils.batch import collect_documents
+from utils.incremental import ChunkManifest
+from utils.parallel_chunking import chunk_deltas, chunk_documents
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Параллельное разбиение множества документов на фрагменты"
+    )
+    parser.add_argument(
+        "source",
+        nargs="?",
+        default="extracted",
+        help="Папка или glob-шаблон с документами (DoclingDocument .json или исходные файлы)",
+    )
+    parser.add_argument("--max-tokens", type=int, default=1024, help="Максимум токенов во фрагменте")
+    parser.add_argument("--workers", type=int, default=None, help="Количество процессов")
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=None,
+        help="Максимум документов в обработке одновременно (ограничивает память)",
+    )
+    parser.add_argument("--output", default="chunks.jsonl", help="Файл для фрагментов (JSON Lines)")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Выводить только добавленные, изменённые и удалённые фрагменты",
+    )
+    parser.add_argument(
+        "--manifest",
+        default="chunks_manifest.json",
+        help="Манифест хэшей разделов и фрагментов предыдущего запуска",
+    )
+    return parser.parse_args()
+
+
+def write_record(f, record, op="upsert"):
+    row = {"op": op, "chunk_id": record.chunk_id, **asdict(record)}
+    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def write_delete(f, doc_id, content_hash):
+    row = {"op": "delete", "doc_id": doc_id, "content_hash": content_hash}
+    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def report_failures(failed):
+    """
+    Печатает документы, которые не удалось загрузить или разбить
+    """
+    def on_error(source, error):
+        failed[source] = f"{type(error).__name__}: {error}"
+        print(f"❌ {source}: {failed[source]}")
+
+    return on_error
+
+
+def run_incremental(args, sources):
+    """
+    Разбивает заново только документы с изменёнными разделами и пишет в args.output
+    дельту - фрагменты изменённых разделов
+    """
+    manifest = ChunkManifest(args.manifest)
+    added = changed = removed = unchanged = 0
+    failed = {}
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        for delta in chunk_deltas(
+            sources,
+            manifest,
+            max_tokens=args.max_tokens,
+            workers=args.workers,
+            max_in_flight=args.max_in_flight,
+            on_error=report_failures(failed),
+        ):
+            for record in delta.added + delta.changed:
+                write_record(f, record)
+            for content_hash in delta.removed_hashes:
+                write_delete(f, delta.doc_id, content_hash)
+
+            added += len(delta.added)
+            changed += len(delta.changed)
+            removed += len(delta.removed_hashes) - len(delta.changed)
+            unchanged += delta.unchanged
+            if not delta.is_empty:
+                print(
+                    f"✂️ {delta.doc_id}: +{len(delta.added)} ~{len(delta.changed)} "
+                    f"-{len(delta.removed_hashes) - len(delta.changed)}"
+                )
+
+        # Документы, исчезнувшие из корпуса, удаляются целиком
+        for doc_id, hashes in manifest.remove_missing(sources).items():
+            for content_hash in hashes:
+                write_delete(f, doc_id, content_hash)
+            removed += len(hashes)
+            print(f"🗑️ {doc_id}: документ удалён ({len(hashes)} фрагментов)")
+
+    manifest.save()
+    print("\n" + "="*60)
+    print("📊 ИЗМЕНЕНИЯ:")
+    print("="*60)
+    print(f"➕ Добавлено: {added}")
+    print(f"✏️ Изменено: {changed}")
+    print(f"➖ Удалено: {removed}")
+    print(f"✅ Без изменений: {unchanged}")
+    if failed:
+        print(f"❌ Ошибок: {len(failed)} (документы будут обработаны при следующем запуске)")
+    print(f"📁 Дельта сохранена в: {args.output}")
+
+
+def main():
+    args = parse_args()
+
+    print("🚀 Начинаю параллельное разбиение документов...")
+    sources = collect_documents(args.source)
+    if not sources:
+        print(f"❌ Не найдено документов по пути: {args.source}")
+        return
+
+    print(f"📄 Документов: {len(sources)}")
+    if args.incremental:
+        run_incremental(args, sources)
+        return
+
+    started = time.perf_counter()
+    total_chunks = 0
+    documents = set()
+    failed = {}
+
+    # Фрагменты приходят в детерминированном порядке: документ за документом
+    with open(args.output, "w", encoding="utf-8") as f:
+        for record in chunk_documents(
+            sources,
+            max_tokens=args.max_tokens,
+            workers=args.workers,
+            max_in_flight=args.max_in_flight,
+            on_error=report_failures(failed),
+        ):
+            write_record(f, record)
+
+            total_chunks += 1
+            if record.doc_id not in documents:
+                documents.add(record.doc_id)
+                print(f"✂️ [{len(documents)}/{len(sources)}] {record.doc_id}")
+
+    elapsed = time.perf_counter() - started
+    print("\n" + "="*60)
+    print("📊 СТАТИСТИКА РАЗБИЕНИЯ:")
+    print("="*60)
+    print(f"📋 Всего фрагментов: {total_chunks}")
+    if failed:
+        print(f"❌ Ошибок: {len(failed)} из {len(sources)} документов")
+    print(f"⏱️ Время: {elapsed:.1f} с ({len(sources) / elapsed:.2f} документов/с)")
+    print(f"📁 Фрагменты сохранены в: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 from docling.chunking import HybridChunker
-from docling.document_converter import DocumentConverter
 from dotenv import load_dotenv
 from openai import OpenAI
 import json
 from datetime import datetime
 
+from utils.conversion_server import convert_document
+from utils.tokenizer import OpenAITokenizerWrapper
+
 load_dotenv()
 
 # Initialize OpenAI client
@@ -16,9 +18,9 @@ print("🚀 Начинаю процесс разбиения документа
 # Извлечение данных из локального документа
 # --------------------------------------------------------------
 
-converter = DocumentConverter()
 print("📄 Обрабатываю документ...")
-result = converter.convert("documents/ЛОГИКА_ПРОДАЖИ_ТЕСТОВОГО_ПЕРИОДА_ЛИДГЕНБЮРО.md")
+# Через сервер конвертации, если он запущен, иначе локально с кэшем
+document = convert_document("documents/ЛОГИКА_ПРОДАЖИ_ТЕСТОВОГО_ПЕРИОДА_ЛИДГЕНБЮРО.md")
 
 # --------------------------------------------------------------
 # Применение гибридного разбиения (НОВЫЙ API)
@@ -26,19 +28,24 @@ result = converter.convert("documents/ЛОГИКА_ПРОДАЖИ_ТЕСТОВО
 
 print("🔧 Настраиваю HybridChunker...")
 # Новый API HybridChunker
+# tiktoken-токенизатор с кэшем подсчётов: чанкер многократно измеряет одни и те же фрагменты.
+# Размер считается в токенах cl100k_base - тех же, что у модели эмбеддингов
+tokenizer = OpenAITokenizerWrapper(max_length=8000)
+
 chunker = HybridChunker(
+    tokenizer=tokenizer.chunker_tokenizer(),
     chunk_size=8000,  # Вместо max_tokens
     overlap=100       # Перекрытие между фрагментами
 )
 
 print("✂️ Разбиваю документ на смысловые фрагменты...")
-chunk_iter = chunker.chunk(dl_doc=result.document)
+chunk_iter = chunker.chunk(dl_doc=document)
 chunks = list(chunk_iter)
 
 print(f"✅ Разбиение завершено!")
 print(f"📊 Статистика:")
 print(f"   • Всего фрагментов: {len(chunks)}")
-print(f"   • Размер фрагмента: до 1024 токенов")
+print(f"   • Размер фрагмента: до {tokenizer.model_max_length} токенов cl100k_base")
 
 # --------------------------------------------------------------
 # Анализ созданных фрагментов
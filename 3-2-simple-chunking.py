@@ -1,119 +1,207 @@
+import argparse
+import os
 import re
+import shutil
+import tempfile
 from datetime import datetime
-from typing import List, Dict
+from typing import Dict, Iterable, Iterator, List, Match, Optional, Tuple
 
 class SimpleChunk:
     """Простой класс для хранения чанка"""
-    def __init__(self, text: str, heading: str, stage_number: int):
+    __slots__ = ("text", "heading", "stage_number", "level", "part", "size")
+
+    def __init__(
+        self, text: str, heading: str, stage_number: int, level: int = 2, part: int = 0
+    ):
         self.text = text
         self.heading = heading
         self.stage_number = stage_number
+        self.level = level
+        # Номер части, если этап был разделён по лимиту токенов (0 - не разделён)
+        self.part = part
         self.size = len(text)
 
+    @property
+    def label(self) -> str:
+        suffix = f" (часть {self.part})" if self.part else ""
+        return f"Этап {self.stage_number}{suffix}"
+
+class HeadingRule:
+    """
+    Правило заголовка: скомпилированный паттерн и уровень заголовка.
+    Если в паттерне есть группа, она используется как номер этапа.
+    Заголовок закрывает текущий раздел, только если его уровень такой же или выше
+    (число меньше или равно); более глубокий заголовок остаётся внутри раздела.
+    """
+    __slots__ = ("pattern", "level")
+
+    def __init__(self, pattern: str, level: int = 2):
+        self.pattern = re.compile(pattern)
+        self.level = level
+
+# Паттерн для поиска заголовков этапов
+DEFAULT_RULES = [HeadingRule(r'^## Этап (\d+)', level=2)]
+
 class SimpleChunker:
     """
     Простой чанкер, который разбивает документ по заголовкам этапов
     """
     
-    def __init__(self):
-        # Паттерн для поиска заголовков этапов
-        self.stage_pattern = r'^## Этап (\d+)'
-        
-    def chunk_by_stages(self, file_path: str) -> List[SimpleChunk]:
+    def __init__(self, rules: Optional[List[HeadingRule]] = None):
+        # Правила заголовков; совпадение того же или более высокого уровня начинает новый чанк
+        self.rules = rules or DEFAULT_RULES
+
+    def _match_heading(self, line: str) -> Optional[Tuple[HeadingRule, Match]]:
+        for rule in self.rules:
+            match = rule.pattern.match(line)
+            if match:
+                return rule, match
+        return None
+
+    def iter_chunks(self, file_path: str) -> Iterator[SimpleChunk]:
         """
-        Разбивает документ на чанки по этапам
+        Потоково разбивает документ: читает файл построчно и отдаёт чанк,
+        как только закрывается его раздел. В памяти хранится только текущий раздел.
         
         Args:
             file_path: путь к markdown файлу
             
-        Returns:
-            список SimpleChunk объектов
+        Yields:
+            SimpleChunk объекты в порядке следования в документе
         """
-        print(f"📄 Читаю файл: {file_path}")
-        
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        print("✂️ Разбиваю по этапам...")
-        
-        # Разбиваем на строки
-        lines = content.split('\n')
-        chunks = []
         current_chunk = []
         current_heading = ""
         current_stage = 0
-        
-        for line in lines:
-            # Проверяем, является ли строка заголовком этапа
-            stage_match = re.match(self.stage_pattern, line)
-            
-            if stage_match:
-                # Сохраняем предыдущий чанк (если есть)
-                if current_chunk and current_heading:
-                    chunk_text = '\n'.join(current_chunk).strip()
-                    if chunk_text:  # Только если есть содержимое
-                        chunks.append(SimpleChunk(
-                            text=chunk_text,
-                            heading=current_heading,
-                            stage_number=current_stage
-                        ))
-                
-                # Начинаем новый чанк
-                current_stage = int(stage_match.group(1))
-                current_heading = line.strip()
-                current_chunk = [line]
-            else:
-                # Добавляем строку к текущему чанку
-                current_chunk.append(line)
-        
+        current_level = 0
+        sections = 0
+
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.rstrip('\n')
+                # Проверяем, является ли строка заголовком этапа
+                heading = self._match_heading(line)
+                # Более глубокий заголовок - часть текущего раздела
+                if heading and current_heading and heading[0].level > current_level:
+                    heading = None
+
+                if heading:
+                    # Отдаём предыдущий чанк (если есть)
+                    if current_chunk and current_heading:
+                        chunk_text = '\n'.join(current_chunk).strip()
+                        if chunk_text:  # Только если есть содержимое
+                            yield SimpleChunk(
+                                text=chunk_text,
+                                heading=current_heading,
+                                stage_number=current_stage,
+                                level=current_level
+                            )
+
+                    # Начинаем новый чанк
+                    rule, match = heading
+                    sections += 1
+                    number = match.group(1) if match.groups() else None
+                    current_stage = int(number) if number and number.isdigit() else sections
+                    current_level = rule.level
+                    current_heading = line.strip()
+                    current_chunk = [line]
+                else:
+                    # Добавляем строку к текущему чанку
+                    current_chunk.append(line)
+
         # Не забываем последний чанк
         if current_chunk and current_heading:
             chunk_text = '\n'.join(current_chunk).strip()
             if chunk_text:
-                chunks.append(SimpleChunk(
+                yield SimpleChunk(
                     text=chunk_text,
                     heading=current_heading,
-                    stage_number=current_stage
-                ))
+                    stage_number=current_stage,
+                    level=current_level
+                )
+        
+    def chunk_by_stages(self, file_path: str) -> List[SimpleChunk]:
+        """
+        Разбивает документ на чанки по этапам и собирает их в список.
+        Для больших файлов используйте iter_chunks() - он не держит чанки в памяти
         
+        Args:
+            file_path: путь к markdown файлу
+            
+        Returns:
+            список SimpleChunk объектов
+        """
+        print(f"📄 Читаю файл: {file_path}")
+        print("✂️ Разбиваю по этапам...")
+
+        chunks = list(self.iter_chunks(file_path))
+
         print(f"✅ Создано {len(chunks)} чанков по этапам")
         return chunks
 
-def save_chunks_to_markdown(chunks: List[SimpleChunk], filename: str = "simple_chunks.md"):
+def limit_chunk_size(chunks: Iterable[SimpleChunk], limiter) -> Iterator[SimpleChunk]:
+    """
+    Делит этапы, превышающие лимит токенов, по абзацам и предложениям.
+    Каждая часть сохраняет заголовок, номер этапа и уровень родительского этапа.
+    
+    Args:
+        chunks: SimpleChunk объекты
+        limiter: utils.splitter.TokenLimiter
+    """
+    for chunk in chunks:
+        pieces = limiter.split(chunk.text, header=chunk.heading)
+        if len(pieces) == 1:
+            yield chunk
+            continue
+        for part, text in enumerate(pieces, 1):
+            yield SimpleChunk(
+                text=text,
+                heading=chunk.heading,
+                stage_number=chunk.stage_number,
+                level=chunk.level,
+                part=part
+            )
+
+def save_chunks_to_markdown(
+    chunks: Iterable[SimpleChunk], filename: str = "simple_chunks.md"
+) -> Dict[str, int]:
     """
-    Сохраняет чанки в красивый Markdown файл
+    Потоково сохраняет чанки в красивый Markdown файл: каждый чанк пишется сразу,
+    а статистика и содержание, известные только в конце, дописываются после этапов.
+    Строки содержания копятся во временном файле, поэтому память не растёт с числом чанков
     
     Args:
-        chunks: список SimpleChunk объектов
+        chunks: SimpleChunk объекты (список или генератор)
         filename: имя выходного файла
+        
+    Returns:
+        статистика: chunks, stages, total_chars, max_size, min_size
     """
-    with open(filename, "w", encoding="utf-8") as f:
+    stats = {"chunks": 0, "stages": 0, "total_chars": 0, "max_size": 0, "min_size": 0}
+
+    with open(filename, "w", encoding="utf-8") as f, tempfile.TemporaryFile(
+        "w+", encoding="utf-8"
+    ) as toc:
         # Заголовок документа
         f.write("# Простое разбиение документа по этапам\n\n")
         f.write(f"**Дата создания:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-        f.write(f"**Всего этапов:** {len(chunks)}\n\n")
-        
-        # Статистика
-        total_chars = sum(chunk.size for chunk in chunks)
-        avg_size = total_chars // len(chunks) if chunks else 0
-        
-        f.write("## 📊 Статистика\n\n")
-        f.write(f"- **Общее количество символов:** {total_chars:,}\n")
-        f.write(f"- **Средний размер этапа:** {avg_size:,} символов\n")
-        f.write(f"- **Самый большой этап:** {max(chunk.size for chunk in chunks):,} символов\n")
-        f.write(f"- **Самый маленький этап:** {min(chunk.size for chunk in chunks):,} символов\n\n")
-        
-        f.write("---\n\n")
-        
-        # Содержание
-        f.write("## 📋 Содержание\n\n")
-        for chunk in chunks:
-            f.write(f"- [Этап {chunk.stage_number}](#этап-{chunk.stage_number})\n")
-        f.write("\n---\n\n")
+        f.write("Статистика и содержание - в конце файла: [📊 Статистика](#-статистика)\n\n")
         
         # Детальные этапы
-        for i, chunk in enumerate(chunks, 1):
-            f.write(f"## Этап {chunk.stage_number}\n\n")
+        for chunk in chunks:
+            # Разделитель между этапами
+            if stats["chunks"]:
+                f.write("---\n\n")
+
+            stats["chunks"] += 1
+            stats["stages"] += chunk.part <= 1
+            stats["total_chars"] += chunk.size
+            stats["max_size"] = max(stats["max_size"], chunk.size)
+            stats["min_size"] = min(stats["min_size"] or chunk.size, chunk.size)
+
+            anchor = re.sub(r"[^\w\s-]", "", chunk.label.lower()).replace(" ", "-")
+            toc.write(f"- [{chunk.label}](#{anchor})\n")
+
+            f.write(f"## {chunk.label}\n\n")
             
             # Метаданные
             f.write("### 📊 Информация об этапе\n\n")
@@ -126,55 +214,118 @@ def save_chunks_to_markdown(chunks: List[SimpleChunk], filename: str = "simple_c
             f.write("```markdown\n")
             f.write(chunk.text)
             f.write("\n```\n\n")
-            
-            # Разделитель между этапами
-            if i < len(chunks):
-                f.write("---\n\n")
+
+        avg_size = stats["total_chars"] // stats["chunks"] if stats["chunks"] else 0
+
+        # Статистика
+        f.write("---\n\n")
+        f.write("## 📊 Статистика\n\n")
+        f.write(f"- **Всего этапов:** {stats['chunks']}\n")
+        f.write(f"- **Общее количество символов:** {stats['total_chars']:,}\n")
+        f.write(f"- **Средний размер этапа:** {avg_size:,} символов\n")
+        f.write(f"- **Самый большой этап:** {stats['max_size']:,} символов\n")
+        f.write(f"- **Самый маленький этап:** {stats['min_size']:,} символов\n\n")
+
+        # Содержание
+        f.write("## 📋 Содержание\n\n")
+        toc.seek(0)
+        shutil.copyfileobj(toc, f)
+        f.write("\n")
     
     print(f"📁 Все этапы сохранены в файл: {filename}")
+    return stats
+
+def print_sizes(chunks: Iterable[SimpleChunk]) -> Iterator[SimpleChunk]:
+    """Печатает размер каждого чанка по мере того, как он проходит дальше"""
+    for chunk in chunks:
+        print(f"   {chunk.label}: {chunk.size:,} символов")
+        yield chunk
+
+def parse_heading_rule(value: str) -> HeadingRule:
+    """Разбирает правило вида 'ПАТТЕРН' или 'ПАТТЕРН::УРОВЕНЬ'"""
+    pattern, _, level = value.rpartition("::")
+    if not pattern:
+        return HeadingRule(value)
+    return HeadingRule(pattern, int(level))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Простое разбиение документа по заголовкам")
+    parser.add_argument(
+        "input_file",
+        nargs="?",
+        default="documents/ЛОГИКА_ПРОДАЖИ_ТЕСТОВОГО_ПЕРИОДА_ЛИДГЕНБЮРО.md",
+        help="Путь к markdown файлу",
+    )
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        default=8000,
+        help="Лимит токенов на чанк для модели эмбеддингов (0 - не ограничивать)",
+    )
+    parser.add_argument(
+        "--overlap",
+        type=int,
+        default=100,
+        help="Перекрытие в токенах между частями разделённого этапа",
+    )
+    parser.add_argument(
+        "--heading",
+        action="append",
+        type=parse_heading_rule,
+        help="Регулярное выражение заголовка (можно несколько), например '^## Этап (\\d+)::2'",
+    )
+    return parser.parse_args()
 
 def main():
     """Основная функция"""
+    args = parse_args()
     print("🚀 Начинаю простое разбиение документа по этапам...")
     
     # Путь к файлу
-    input_file = "documents/ЛОГИКА_ПРОДАЖИ_ТЕСТОВОГО_ПЕРИОДА_ЛИДГЕНБЮРО.md"
+    input_file = args.input_file
     
     # Создаем чанкер
-    chunker = SimpleChunker()
+    chunker = SimpleChunker(rules=args.heading)
     
+    output_file = "simple_chunks_by_stages.md"
+
     try:
-        # Разбиваем документ
-        chunks = chunker.chunk_by_stages(input_file)
-        
-        if not chunks:
+        # Разбиваем документ потоково: чанки идут от чтения файла до записи по одному
+        print(f"📄 Читаю файл: {input_file}")
+        print("✂️ Разбиваю по этапам...")
+        chunks = chunker.iter_chunks(input_file)
+
+        if args.max_tokens:
+            from utils.splitter import TokenLimiter
+
+            # Слишком длинные этапы делим заранее, чтобы эмбеддинг не обрезал их
+            limiter = TokenLimiter(max_tokens=args.max_tokens, overlap_tokens=args.overlap)
+            chunks = limit_chunk_size(chunks, limiter)
+
+        print(f"\n🔍 Размеры этапов:")
+        stats = save_chunks_to_markdown(print_sizes(chunks), output_file)
+
+        if not stats["chunks"]:
+            os.remove(output_file)
             print("❌ Не найдено ни одного этапа в документе!")
             return
+        if stats["chunks"] > stats["stages"]:
+            print(
+                f"✂️ Этапы длиннее {args.max_tokens} токенов разделены: "
+                f"{stats['stages']} → {stats['chunks']} чанков"
+            )
         
         # Показываем статистику
         print("\n" + "="*60)
         print("📊 СТАТИСТИКА РАЗБИЕНИЯ:")
         print("="*60)
         
-        total_chars = sum(chunk.size for chunk in chunks)
-        
-        print(f"📋 Всего этапов: {len(chunks)}")
-        print(f"📏 Общий размер: {total_chars:,} символов")
-        print(f"📐 Средний размер этапа: {total_chars // len(chunks):,} символов")
-        
-        print(f"\n🔍 Размеры этапов:")
-        for chunk in chunks:
-            print(f"   Этап {chunk.stage_number}: {chunk.size:,} символов")
-        
-        # Сохраняем результат
-        print("\n" + "="*60)
-        print("💾 СОХРАНЕНИЕ РЕЗУЛЬТАТА:")
-        print("="*60)
-        
-        save_chunks_to_markdown(chunks, "simple_chunks_by_stages.md")
+        print(f"📋 Всего этапов: {stats['chunks']}")
+        print(f"📏 Общий размер: {stats['total_chars']:,} символов")
+        print(f"📐 Средний размер этапа: {stats['total_chars'] // stats['chunks']:,} символов")
         
         print("\n✅ Готово! Документ разбит по этапам.")
-        print("📄 Результат сохранен в: simple_chunks_by_stages.md")
+        print(f"📄 Результат сохранен в: {output_file}")
         
     except FileNotFoundError:
         print(f"❌ Файл не найден: {input_file}")
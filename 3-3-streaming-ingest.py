@@ -0,0 +1,218 @@
+import argparse
+import threading
+import time
+
+import lancedb
+from dotenv import load_dotenv
+
+from utils.batch import collect_documents
+from utils.chunks import ChunkRecord
+from utils.dedupe import deduplicate
+from utils.embedding_cache import EmbeddingCache
+from utils.embedding_scheduler import RateLimiter, embed_with_cache
+from utils.embeddings import get_embedding_function, make_embedder
+from utils.parallel_chunking import load_document
+from utils.pipeline import Pipeline, Stage
+from utils.profiles import DEFAULT_PROFILE, make_converter
+from utils.schema import metadata_hash, open_chunks_table, to_row
+from utils.splitter import EMBEDDING_MAX_TOKENS, TokenLimiter
+from utils.table_stats import update_catalog
+from utils.table_sync import TableSync, stable_chunk_id
+from utils.tokenizer import OpenAITokenizerWrapper
+from utils.vector_index import (
+    INDEX_TYPES,
+    create_scalar_indexes,
+    create_text_index,
+    maintain_vector_index,
+)
+
+load_dotenv()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Потоковая загрузка корпуса: конвертация → разбиение → эмбеддинги → LanceDB"
+    )
+    parser.add_argument(
+        "source",
+        nargs="?",
+        default="extracted",
+        help="Папка или glob-шаблон с документами (DoclingDocument .json или исходные файлы)",
+    )
+    parser.add_argument("--convert-workers", type=int, default=2, help="Потоков конвертации")
+    parser.add_argument("--chunk-workers", type=int, default=2, help="Потоков разбиения")
+    parser.add_argument("--embed-workers", type=int, default=2, help="Потоков эмбеддинга")
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=4,
+        help="Размер очереди между этапами (ограничивает пиковую память)",
+    )
+    parser.add_argument("--max-tokens", type=int, default=1024, help="Максимум токенов во фрагменте")
+    parser.add_argument("--rpm", type=int, default=3000, help="Лимит запросов к API в минуту")
+    parser.add_argument("--tpm", type=int, default=1_000_000, help="Лимит токенов к API в минуту")
+    parser.add_argument("--rebuild", action="store_true", help="Пересоздать таблицу с нуля")
+    parser.add_argument(
+        "--index",
+        choices=INDEX_TYPES,
+        default="none",
+        help="Квантованный ANN-индекс после загрузки: ivf_pq (PQ) или ivf_hnsw_sq (int8)",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    print("🚀 Начинаю потоковую загрузку корпуса...")
+    sources = collect_documents(args.source)
+    if not sources:
+        print(f"❌ Не найдено документов по пути: {args.source}")
+        return
+    print(f"📄 Документов: {len(sources)}")
+
+    db = lancedb.connect("data/lancedb")
+    func = get_embedding_function()
+    print(f"🧠 Модель эмбеддингов: {func.name} ({func.ndims()} измерений)")
+    table = open_chunks_table(db, func, rebuild=args.rebuild)
+    sync = TableSync(table)
+    embedding_cache = EmbeddingCache()
+
+    # У каждого потока свой конвертер (модели docling грузятся один раз на поток),
+    # токенизатор (кэш подсчётов не потокобезопасен), чанкер и планировщик эмбеддингов;
+    # лимиты RPM/TPM - один общий бакет на все потоки
+    local = threading.local()
+    schedulers = []
+    limiter = RateLimiter(args.rpm, args.tpm)
+
+    # Ошибка в одном документе не останавливает загрузку: документ пропускается
+    # (его новые фрагменты не записываются, он обработается при следующем запуске),
+    # а sync.finish() всё равно выполняется
+    failed = {}
+
+    def report_failure(item, error):
+        source = item if isinstance(item, str) else item[0]
+        failed[source] = f"{type(error).__name__}: {error}"
+        print(f"  ❌ {source}: {failed[source]}")
+
+    def thread_tokenizer():
+        if not hasattr(local, "tokenizer"):
+            local.tokenizer = OpenAITokenizerWrapper(max_length=args.max_tokens)
+        return local.tokenizer
+
+    def convert(source):
+        if not hasattr(local, "converter"):
+            local.converter = make_converter(DEFAULT_PROFILE)
+        yield source, load_document(source, local.converter)
+
+    def chunk(item):
+        from docling.chunking import HybridChunker
+
+        source, document = item
+        if not hasattr(local, "chunker"):
+            tokenizer = thread_tokenizer()
+            local.chunker = HybridChunker(
+                tokenizer=tokenizer.chunker_tokenizer(),
+                chunk_size=args.max_tokens,
+                overlap=100,
+            )
+            local.limiter = TokenLimiter(
+                EMBEDDING_MAX_TOKENS, overlap_tokens=100, tokenizer=tokenizer
+            )
+        records = [
+            ChunkRecord.from_doc_chunk(source, index, doc_chunk)
+            for index, doc_chunk in enumerate(local.chunker.chunk(dl_doc=document))
+        ]
+        # Дубликаты ищутся внутри документа: документы идут через разные потоки,
+        # поэтому одинаковые фрагменты разных документов эмбеддятся отдельно
+        # (повторный текст обычно уже лежит в кэше эмбеддингов и не идёт в API)
+        yield source, deduplicate(list(local.limiter.split_records(records)))
+
+    def embed(item):
+        source, dedupe = item
+        if not hasattr(local, "scheduler"):
+            local.scheduler = make_embedder(
+                func,
+                thread_tokenizer().count_tokens,
+                limiter=limiter,
+            )
+            schedulers.append(local.scheduler)
+
+        ids = [stable_chunk_id(r.doc_id, r.content_hash) for r in dedupe.canonical]
+        metas = [metadata_hash(r, dedupe.sources[r.chunk_id]) for r in dedupe.canonical]
+        pending = [dedupe.canonical[i] for i in sync.plan([source], ids, metas)]
+        batches = []
+
+        def on_batch(indexes, vectors):
+            batches.append(
+                [
+                    to_row(pending[i], vector, dedupe.sources[pending[i].chunk_id])
+                    for i, vector in zip(indexes, vectors)
+                ]
+            )
+
+        embed_with_cache(
+            local.scheduler, embedding_cache, func.ndims(), [r.text for r in pending], on_batch
+        )
+        return batches
+
+    def write(rows):
+        sync.upsert(rows)
+        yield len(rows)
+
+    pipeline = Pipeline(
+        [
+            Stage("convert", convert, args.convert_workers, args.queue_size, report_failure),
+            Stage("chunk", chunk, args.chunk_workers, args.queue_size, report_failure),
+            Stage("embed", embed, args.embed_workers, args.queue_size, report_failure),
+            Stage("write", write, 1, args.queue_size),
+        ]
+    )
+
+    started = time.perf_counter()
+    written = 0
+    for count in pipeline.run(sources):
+        written += count
+        print(f"  💾 Записано фрагментов: {written}")
+
+    report = sync.finish(corpus_doc_ids=sources)
+    embedding_cache.close()
+    if report.upserted or report.deleted or not table.list_indices():
+        if args.index != "none":
+            print(f"🗂️ Векторный индекс {args.index}: {maintain_vector_index(table, args.index)}")
+        # Существующие индексы уже дополнены новыми строками в sync.finish() (optimize)
+        built = create_scalar_indexes(table)
+        if built:
+            print(f"🗂️ Скалярные индексы построены: {', '.join(built)}")
+        if create_text_index(table):
+            print("🔤 Полнотекстовый индекс (BM25) по text построен")
+    catalog = update_catalog(table, sync.changed_doc_ids, corpus_doc_ids=sources)
+    elapsed = time.perf_counter() - started
+
+    print("\n" + "="*60)
+    print("📊 СТАТИСТИКА ЗАГРУЗКИ:")
+    print("="*60)
+    for stats in pipeline.stats:
+        print(
+            f"⚙️ {stats.name}: {stats.items_in} → {stats.items_out}, "
+            f"работа {stats.busy_seconds:.1f} с, ожидание очереди {stats.blocked_seconds:.1f} с"
+        )
+    cache_stats = embedding_cache.stats
+    print(f"🗄️ Кэш эмбеддингов: {cache_stats.hits} попаданий, {cache_stats.misses} промахов")
+    print(f"🌐 Запросов к модели: {sum(s.stats.requests for s in schedulers)}")
+    print(
+        f"🔄 Записано {report.upserted}, удалено {report.deleted}, "
+        f"без изменений {report.unchanged}"
+    )
+    summary = catalog.summary()
+    print(
+        f"📚 В таблице: {summary['rows']} фрагментов, {summary['documents']} документов, "
+        f"{summary['sections']} разделов"
+    )
+    if failed:
+        print(f"❌ С ошибками: {len(failed)} документов (будут обработаны при следующем запуске)")
+    print(f"⏱️ Время: {elapsed:.1f} с ({len(sources) / elapsed:.2f} документов/с)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,44 @@
-from typing import List
+import argparse
 
 import lancedb
 from docling.chunking import HybridChunker
-from docling.document_converter import DocumentConverter
 from dotenv import load_dotenv
-from lancedb.embeddings import get_registry
-from lancedb.pydantic import LanceModel, Vector
 from openai import OpenAI
 
+from utils.chunks import ChunkRecord
+from utils.conversion_server import convert_document
+from utils.dedupe import deduplicate
+from utils.embedding_cache import EmbeddingCache
+from utils.embedding_scheduler import embed_with_cache
+from utils.embeddings import get_embedding_function, make_embedder
+from utils.schema import metadata_hash, open_chunks_table, to_row
+from utils.splitter import EMBEDDING_MAX_TOKENS, TokenLimiter
+from utils.table_stats import sample_rows, update_catalog
+from utils.table_sync import TableSync, stable_chunk_id
+from utils.tokenizer import OpenAITokenizerWrapper
+from utils.vector_index import (
+    INDEX_TYPES,
+    create_scalar_indexes,
+    create_text_index,
+    maintain_vector_index,
+)
+
 load_dotenv()
 
+parser = argparse.ArgumentParser(description="Эмбеддинги фрагментов и синхронизация таблицы LanceDB")
+parser.add_argument(
+    "--rebuild",
+    action="store_true",
+    help="Пересоздать таблицу с нуля вместо инкрементальной синхронизации",
+)
+parser.add_argument(
+    "--index",
+    choices=INDEX_TYPES,
+    default="none",
+    help="Квантованный ANN-индекс после загрузки: ivf_pq (PQ) или ivf_hnsw_sq (int8)",
+)
+args = parser.parse_args()
+
 # Initialize OpenAI client
 client = OpenAI()
 
@@ -19,19 +48,23 @@ print("🚀 Создаем эмбеддинги для документа...")
 # Extract the data
 # --------------------------------------------------------------
 
-converter = DocumentConverter()
-result = converter.convert("documents/ЛОГИКА_ПРОДАЖИ_ТЕСТОВОГО_ПЕРИОДА_ЛИДГЕНБЮРО.md")
+SOURCE_PATH = "documents/ЛОГИКА_ПРОДАЖИ_ТЕСТОВОГО_ПЕРИОДА_ЛИДГЕНБЮРО.md"
+document = convert_document(SOURCE_PATH)
 
 # --------------------------------------------------------------
 # Apply hybrid chunking (НОВЫЙ API)
 # --------------------------------------------------------------
 
+# tiktoken-токенизатор с кэшем подсчётов: чанкер многократно измеряет одни и те же фрагменты
+tokenizer = OpenAITokenizerWrapper(max_length=1024)
+
 chunker = HybridChunker(
+    tokenizer=tokenizer.chunker_tokenizer(),
     chunk_size=1024,  # Вместо max_tokens
     overlap=100       # Перекрытие
 )
 
-chunk_iter = chunker.chunk(dl_doc=result.document)
+chunk_iter = chunker.chunk(dl_doc=document)
 chunks = list(chunk_iter)
 print(f"✂️ Создано {len(chunks)} фрагментов для эмбеддинга")
 
@@ -42,76 +75,126 @@ print(f"✂️ Создано {len(chunks)} фрагментов для эмбе
 # Create a LanceDB database
 db = lancedb.connect("data/lancedb")
 
-# Get the OpenAI embedding function
-func = get_registry().get("openai").create(name="text-embedding-3-small")
+# Функция эмбеддингов выбирается через EMBEDDING_PROVIDER: openai | onnx | hashing
+func = get_embedding_function()
+print(f"🧠 Модель эмбеддингов: {func.name} ({func.ndims()} измерений)")
 
-# Define a simplified metadata schema
-class ChunkMetadata(LanceModel):
-    """
-    You must order the fields in alphabetical order.
-    This is a requirement of the Pydantic implementation.
-    """
-
-    filename: str
-    title: str
-
-# Define the main Schema
-class Chunks(LanceModel):
-    text: str = func.SourceField()
-    vector: Vector(func.ndims()) = func.VectorField()  # type: ignore
-    metadata: ChunkMetadata
-
-table = db.create_table("docling", schema=Chunks, mode="overwrite")
+# Таблица пересоздаётся только по --rebuild или если её схема устарела (нет id, другая размерность)
+table = open_chunks_table(db, func, rebuild=args.rebuild)
 
 # --------------------------------------------------------------
 # Prepare the chunks for the table
 # --------------------------------------------------------------
 
 # Create table with processed chunks - упрощенная структура метаданных
-processed_chunks = []
-
-for chunk in chunks:
-    # Безопасное извлечение filename
-    filename = "unknown"
-    if hasattr(chunk, 'meta') and chunk.meta:
-        if hasattr(chunk.meta, 'origin') and chunk.meta.origin:
-            if hasattr(chunk.meta.origin, 'filename') and chunk.meta.origin.filename:
-                filename = chunk.meta.origin.filename
-    
-    # Безопасное извлечение title  
-    title = "Untitled"
-    if hasattr(chunk, 'meta') and chunk.meta:
-        if hasattr(chunk.meta, 'headings') and chunk.meta.headings:
-            if len(chunk.meta.headings) > 0:
-                title = chunk.meta.headings[0]
-    
-    processed_chunk = {
-        "text": chunk.text,
-        "metadata": {
-            "filename": filename,
-            "title": title,
-        },
-    }
-    processed_chunks.append(processed_chunk)
-
-print(f"📦 Подготовлено {len(processed_chunks)} фрагментов для индексации")
+records = [
+    ChunkRecord.from_doc_chunk(SOURCE_PATH, index, chunk)
+    for index, chunk in enumerate(chunks)
+]
+
+# Фрагменты длиннее лимита модели эмбеддингов делим заранее по абзацам/предложениям
+limiter = TokenLimiter(max_tokens=EMBEDDING_MAX_TOKENS, overlap_tokens=100, tokenizer=tokenizer)
+records = list(limiter.split_records(records))
+
+# Повторяющиеся и почти одинаковые фрагменты эмбеддим один раз
+dedupe = deduplicate(records, threshold=0.9, tokenizer=tokenizer)
+report = dedupe.report
+print(
+    f"🧹 Дубликаты: {report.exact_duplicates} точных, {report.near_duplicates} почти точных "
+    f"({report.total} → {report.kept} фрагментов)"
+)
+print(
+    f"💰 Сэкономлено: {report.chars_saved} символов, {report.tokens_saved} токенов, "
+    f"~${report.cost_saved:.6f}"
+)
+
+# Фрагменты, уже лежащие в таблице с тем же содержимым, не эмбеддятся и не переписываются
+sync = TableSync(table)
+# Изменившиеся метаданные (заголовок, позиция, дубликаты) тоже переписывают строку;
+# текст тот же, поэтому вектор берётся из кэша эмбеддингов
+ids = [stable_chunk_id(record.doc_id, record.content_hash) for record in dedupe.canonical]
+meta_hashes = [
+    metadata_hash(record, dedupe.sources[record.chunk_id]) for record in dedupe.canonical
+]
+canonical = [dedupe.canonical[i] for i in sync.plan([SOURCE_PATH], ids, meta_hashes)]
+print(
+    f"📦 Новых или изменённых фрагментов: {len(canonical)} "
+    f"(без изменений: {sync.report.unchanged})"
+)
 
 # --------------------------------------------------------------
-# Add the chunks to the table (automatically embeds the text)
+# Embed the chunks and add them to the table
 # --------------------------------------------------------------
 
-table.add(processed_chunks)
+# Векторы берём из локального кэша, API вызывается только для новых текстов:
+# батчи по бюджету токенов, параллельные запросы с лимитами RPM/TPM и повторами.
+# Каждый готовый батч сразу попадает в кэш и в таблицу (вектор задан — LanceDB не эмбеддит заново)
+embedding_cache = EmbeddingCache()
+embedder = make_embedder(func, tokenizer.count_tokens, concurrency=4)
+
+
+def on_batch(indexes, vectors):
+    batch = [canonical[i] for i in indexes]
+    sync.upsert(
+        [
+            to_row(record, vector, dedupe.sources[record.chunk_id])
+            for record, vector in zip(batch, vectors)
+        ]
+    )
+    print(f"  ⚡ Записано фрагментов: {len(batch)}")
+
+
+embed_with_cache(
+    embedder, embedding_cache, func.ndims(), [record.text for record in canonical], on_batch
+)
+stats = embedding_cache.stats
+print(f"🗄️ Кэш эмбеддингов: {stats.hits} попаданий, {stats.misses} промахов ({stats.hit_rate:.0%})")
+if embedder.stats.requests:
+    print(
+        f"🌐 Запросов к модели: {embedder.stats.requests}, повторов: {embedder.stats.retries}, "
+        f"токенов: {embedder.stats.tokens}, время: {embedder.stats.seconds:.1f} с"
+    )
+
+embedding_cache.close()
+
+# Удаляем исчезнувшие фрагменты и документы, затем компактируем таблицу
+sync_report = sync.finish(corpus_doc_ids=[SOURCE_PATH])
+print(
+    f"🔄 Синхронизация: записано {sync_report.upserted}, удалено {sync_report.deleted} "
+    f"(документов удалено: {sync_report.removed_documents}), без изменений {sync_report.unchanged}"
+)
+
+# Сжатый индекс ускоряет поиск; точный порядок восстанавливается refine_factor при запросе
+# Скалярные индексы по doc_id/section/страницам/дате ускоряют поиск с фильтрами
+# Полнотекстовый индекс нужен лексическому и гибридному поиску
+if sync_report.upserted or sync_report.deleted or not table.list_indices():
+    if args.index != "none":
+        print(f"🗂️ Векторный индекс {args.index}: {maintain_vector_index(table, args.index)}")
+    # Существующие индексы уже дополнены новыми строками в sync.finish() (optimize)
+    built = create_scalar_indexes(table)
+    if built:
+        print(f"🗂️ Скалярные индексы построены: {', '.join(built)}")
+    if create_text_index(table):
+        print("🔤 Полнотекстовый индекс (BM25) по text построен")
+
+# Каталог статистики обновляется только по изменённым документам, без чтения векторов
+catalog = update_catalog(table, sync.changed_doc_ids, corpus_doc_ids=[SOURCE_PATH])
+summary = catalog.summary()
 print("💾 Эмбеддинги сохранены в LanceDB!")
-print(f"📊 Всего записей в базе: {table.count_rows()}")
+print(
+    f"📊 Всего записей в базе: {summary['rows']} "
+    f"(документов: {summary['documents']}, разделов: {summary['sections']}, "
+    f"векторы ~{summary['vector_bytes'] / 1024**2:.1f} МБ)"
+)
 
 # --------------------------------------------------------------
 # Load the table
 # --------------------------------------------------------------
 
 print("\n📋 Пример данных из таблицы:")
-sample = table.to_pandas().head(3)
-for idx, row in sample.iterrows():
+# Читаются только нужные столбцы первых строк, без векторов
+for idx, row in enumerate(sample_rows(table, 3, columns=["text", "metadata"])):
     print(f"  • Фрагмент {idx + 1}: {row['text'][:100]}...")
     print(f"    Метаданные: {row['metadata']}")
 
-print(f"\n✅ Готово! Всего записей: {table.count_rows()}")
+print(f"\n✅ Готово! Всего записей: {summary['rows']}")
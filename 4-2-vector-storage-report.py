@@ -0,0 +1,156 @@
+import argparse
+import pathlib
+import tempfile
+import time
+
+import lancedb
+import numpy as np
+import pyarrow as pa
+from dotenv import load_dotenv
+
+from utils.vector_index import MIN_ROWS_FOR_INDEX, create_vector_index
+
+load_dotenv()
+
+# (название, доля размерности, тип хранения, индекс, refine_factor)
+VARIANTS = [
+    ("float32, полный размер", 1.0, "float32", "none", None),
+    ("float16", 1.0, "float16", "none", None),
+    ("float32, 1/2 размерности", 0.5, "float32", "none", None),
+    ("float16, 1/4 размерности", 0.25, "float16", "none", None),
+    ("IVF_PQ", 1.0, "float32", "ivf_pq", None),
+    ("IVF_PQ + пересчёт x10", 1.0, "float32", "ivf_pq", 10),
+    ("IVF_HNSW_SQ (int8)", 1.0, "float32", "ivf_hnsw_sq", None),
+    ("float16 + IVF_HNSW_SQ + пересчёт x5", 1.0, "float16", "ivf_hnsw_sq", 5),
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Сравнение размера, задержки и полноты поиска для разных способов хранения векторов"
+    )
+    parser.add_argument("--table", default="docling", help="Таблица LanceDB с эмбеддингами")
+    parser.add_argument("--queries", type=int, default=100, help="Сколько векторов таблицы использовать как запросы")
+    parser.add_argument("--k", type=int, default=10, help="Глубина поиска для recall@k")
+    parser.add_argument("--max-rows", type=int, default=None, help="Ограничить число строк для теста")
+    return parser.parse_args()
+
+
+def directory_size(path):
+    return sum(p.stat().st_size for p in pathlib.Path(path).rglob("*") if p.is_file())
+
+
+def prepare_vectors(vectors, fraction):
+    """
+    Укорачивает векторы и заново нормирует их.
+    Для text-embedding-3 это равносильно запросу с параметром dimensions
+    """
+    dims = max(1, int(vectors.shape[1] * fraction))
+    shortened = vectors[:, :dims]
+    norms = np.linalg.norm(shortened, axis=1, keepdims=True)
+    return shortened / np.maximum(norms, 1e-12)
+
+
+def exact_top_k(vectors, queries, k):
+    """
+    Эталонные ближайшие соседи: полный перебор по полным векторам float32
+    """
+    distances = (
+        (queries**2).sum(axis=1, keepdims=True)
+        - 2 * queries @ vectors.T
+        + (vectors**2).sum(axis=1)
+    )
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def measure(db, name, vectors, queries, truth, dtype, index_type, refine_factor, k):
+    value_type = pa.float16() if dtype == "float16" else pa.float32()
+    schema = pa.schema(
+        [
+            pa.field("row", pa.int64()),
+            pa.field("vector", pa.list_(value_type, vectors.shape[1])),
+        ]
+    )
+    data = pa.table(
+        {
+            "row": pa.array(np.arange(len(vectors))),
+            "vector": pa.FixedSizeListArray.from_arrays(
+                pa.array(vectors.astype(np.float16 if dtype == "float16" else np.float32).ravel()),
+                vectors.shape[1],
+            ),
+        },
+        schema=schema,
+    )
+    table = db.create_table(name, data=data, mode="overwrite")
+    create_vector_index(table, index_type)
+
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        search = table.search(query.astype(np.float32)).select(["row"]).limit(k)
+        if refine_factor:
+            search = search.refine_factor(refine_factor)
+        started = time.perf_counter()
+        found = search.to_arrow().column("row").to_pylist()
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += len(set(found) & set(expected.tolist()))
+
+    return {
+        "size": directory_size(pathlib.Path(db.uri) / f"{name}.lance"),
+        "p50": float(np.percentile(latencies, 50)),
+        "p99": float(np.percentile(latencies, 99)),
+        "recall": hits / (len(queries) * k),
+    }
+
+
+def main():
+    args = parse_args()
+
+    print("🔍 Загружаю векторы из LanceDB...")
+    source = lancedb.connect("data/lancedb").open_table(args.table)
+    query = source.search().select(["vector"]).limit(args.max_rows)
+    vectors = np.array(query.to_arrow().column("vector").to_pylist(), dtype=np.float32)
+    print(f"📊 Векторов: {len(vectors)}, размерность: {vectors.shape[1]}")
+    if len(vectors) < MIN_ROWS_FOR_INDEX:
+        print(f"⚠️ Меньше {MIN_ROWS_FOR_INDEX} строк: индексы не строятся, сравниваются только форматы")
+
+    rng = np.random.default_rng(0)
+    picked = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    k = min(args.k, len(vectors))
+    # Эталон считается по полным векторам, поэтому потеря точности от сжатия видна в recall
+    truth = exact_top_k(vectors, vectors[picked], k)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db = lancedb.connect(tmp)
+        for i, (label, fraction, dtype, index_type, refine_factor) in enumerate(VARIANTS):
+            shortened = prepare_vectors(vectors, fraction)
+            stats = measure(
+                db,
+                f"variant_{i}",
+                shortened,
+                shortened[picked],
+                truth,
+                dtype,
+                index_type,
+                refine_factor,
+                k,
+            )
+            results.append((label, shortened.shape[1], stats))
+            print(f"  ✅ {label}")
+
+    baseline = results[0][2]["size"]
+    print("\n" + "="*60)
+    print(f"📊 РАЗМЕР / ЗАДЕРЖКА / ПОЛНОТА (recall@{k}):")
+    print("="*60)
+    print(f"{'Вариант':<38}{'Разм.':>6}{'Размер, КБ':>16}{'p50, мс':>9}{'p99, мс':>9}{'Recall':>8}")
+    for label, dims, stats in results:
+        print(
+            f"{label:<38}{dims:>6}{stats['size'] / 1024:>9.0f}"
+            f" ({stats['size'] / baseline:>4.0%}){stats['p50']:>9.2f}{stats['p99']:>9.2f}"
+            f"{stats['recall']:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
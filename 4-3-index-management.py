@@ -0,0 +1,154 @@
+import argparse
+import time
+
+import lancedb
+import numpy as np
+from dotenv import load_dotenv
+
+from utils.vector_index import (
+    INDEX_TYPES,
+    create_scalar_indexes,
+    create_text_index,
+    create_vector_index,
+    maintain_vector_index,
+    vector_index_status,
+)
+
+load_dotenv()
+
+NPROBES_GRID = (1, 5, 10, 20, 50)
+REFINE_GRID = (None, 5, 10)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Управление векторным индексом таблицы LanceDB")
+    parser.add_argument("--table", default="docling", help="Таблица LanceDB")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("status", help="Показать индексы и число непроиндексированных строк")
+
+    build = commands.add_parser("build", help="Построить или обновить векторный индекс")
+    build.add_argument(
+        "--type", choices=INDEX_TYPES[1:], default="ivf_pq", help="Тип векторного индекса"
+    )
+    build.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Перестроить с нуля вместо добавления новых строк в существующий индекс",
+    )
+
+    tune = commands.add_parser("tune", help="Подобрать nprobes/refine_factor по recall и задержке")
+    tune.add_argument("--queries", type=int, default=100, help="Число запросов (векторы из таблицы)")
+    tune.add_argument("--k", type=int, default=10, help="Глубина поиска для recall@k")
+    tune.add_argument("--target-recall", type=float, default=0.95, help="Требуемый recall@k")
+    return parser.parse_args()
+
+
+def show_status(table):
+    print(f"📊 Строк в таблице: {table.count_rows()}")
+    for index in table.list_indices():
+        print(f"🗂️ {index.name}: {index.index_type} по {', '.join(index.columns)}")
+
+    status = vector_index_status(table)
+    if status is None:
+        print("⚠️ Векторного индекса нет: каждый запрос - полный перебор")
+    else:
+        print(
+            f"🧭 Векторный индекс {status['index_type']} ({status['distance_type']}): "
+            f"{status['indexed_rows']} строк в индексе, {status['unindexed_rows']} без индекса"
+        )
+
+
+def build_index(table, index_type, rebuild):
+    started = time.perf_counter()
+    if rebuild:
+        params = create_vector_index(table, index_type)
+        result = f"перестроен {params}" if params else "пропущен: слишком мало строк"
+    else:
+        result = maintain_vector_index(table, index_type)
+    create_scalar_indexes(table, replace=rebuild)
+    create_text_index(table, replace=rebuild)
+    print(f"✅ Векторный индекс {index_type}: {result} ({time.perf_counter() - started:.1f} с)")
+
+
+def timed_ids(search):
+    started = time.perf_counter()
+    ids = search.to_arrow().column("id").to_pylist()
+    return ids, (time.perf_counter() - started) * 1000
+
+
+def tune(table, queries, k, target_recall):
+    if vector_index_status(table) is None:
+        print("❌ Сначала постройте индекс: build --type ivf_pq")
+        return
+
+    rows = table.search().select(["vector"]).limit(None).to_arrow()
+    vectors = np.array(rows.column("vector").to_pylist(), dtype=np.float32)
+    rng = np.random.default_rng(0)
+    picked = vectors[rng.choice(len(vectors), size=min(queries, len(vectors)), replace=False)]
+
+    # Эталон: точный поиск полным перебором в обход индекса
+    truth, exact_latencies = [], []
+    for query in picked:
+        ids, ms = timed_ids(table.search(query).select(["id"]).limit(k).bypass_vector_index())
+        truth.append(set(ids))
+        exact_latencies.append(ms)
+
+    results = []
+    for nprobes in NPROBES_GRID:
+        for refine_factor in REFINE_GRID:
+            hits, latencies = 0, []
+            for query, expected in zip(picked, truth):
+                search = table.search(query).select(["id"]).limit(k).nprobes(nprobes)
+                if refine_factor:
+                    search = search.refine_factor(refine_factor)
+                ids, ms = timed_ids(search)
+                hits += len(expected & set(ids))
+                latencies.append(ms)
+            results.append(
+                (
+                    nprobes,
+                    refine_factor,
+                    hits / (len(picked) * k),
+                    float(np.percentile(latencies, 50)),
+                    float(np.percentile(latencies, 99)),
+                )
+            )
+
+    print("\n" + "="*60)
+    print(f"📊 RECALL@{k} И ЗАДЕРЖКА ({len(picked)} запросов):")
+    print("="*60)
+    print(
+        f"Точный поиск: p50 {np.percentile(exact_latencies, 50):.2f} мс, "
+        f"p99 {np.percentile(exact_latencies, 99):.2f} мс"
+    )
+    print(f"{'nprobes':>8}{'refine':>8}{'recall':>9}{'p50, мс':>10}{'p99, мс':>10}")
+    for nprobes, refine_factor, recall, p50, p99 in results:
+        print(f"{nprobes:>8}{refine_factor or '-':>8}{recall:>9.3f}{p50:>10.2f}{p99:>10.2f}")
+
+    good = [r for r in results if r[2] >= target_recall]
+    if not good:
+        print(f"\n⚠️ Recall {target_recall} не достигнут; увеличьте nprobes или перестройте индекс")
+        return
+    nprobes, refine_factor, recall, p50, _ = min(good, key=lambda r: r[3])
+    print(f"\n✅ Самая быстрая настройка с recall ≥ {target_recall}: recall {recall:.3f}, p50 {p50:.2f} мс")
+    print("   Добавьте в .env:")
+    print(f"   SEARCH_NPROBES={nprobes}")
+    if refine_factor:
+        print(f"   SEARCH_REFINE_FACTOR={refine_factor}")
+
+
+def main():
+    args = parse_args()
+    table = lancedb.connect("data/lancedb").open_table(args.table)
+
+    if args.command == "status":
+        show_status(table)
+    elif args.command == "build":
+        build_index(table, args.type, args.rebuild)
+    else:
+        tune(table, args.queries, args.k, args.target_recall)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import time
+
+import lancedb
+import numpy as np
+from dotenv import load_dotenv
+
+from utils.embeddings import get_embedding_function
+from utils.search import SEARCH_MODES, retrieve
+
+load_dotenv()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Сравнение задержки и попаданий лексического, векторного и гибридного поиска"
+    )
+    parser.add_argument("--table", default="docling", help="Таблица LanceDB")
+    parser.add_argument("--queries", type=int, default=50, help="Сколько фрагментов взять как запросы")
+    parser.add_argument("--query-words", type=int, default=6, help="Длина запроса в словах")
+    parser.add_argument("--k", type=int, default=5, help="Глубина поиска для hit rate@k")
+    return parser.parse_args()
+
+
+def make_queries(table, count, words, seed=0):
+    """
+    Запросы "известного ответа": отрывок из середины фрагмента,
+    правильный ответ - сам фрагмент
+    """
+    rows = table.search().select(["id", "text"]).limit(None).to_arrow().to_pylist()
+    rows = [row for row in rows if len(row["text"].split()) >= words * 2]
+    rng = np.random.default_rng(seed)
+    queries = []
+    for i in rng.choice(len(rows), size=min(count, len(rows)), replace=False):
+        tokens = rows[i]["text"].split()
+        start = (len(tokens) - words) // 2
+        queries.append((" ".join(tokens[start : start + words]), rows[i]["id"]))
+    return queries
+
+
+def measure(table, mode, queries, k, func):
+    latencies, hits, reciprocal_ranks = [], 0, 0.0
+    for query, expected in queries:
+        started = time.perf_counter()
+        found = retrieve(table, query, mode, limit=k, columns=["id"], func=func)
+        latencies.append((time.perf_counter() - started) * 1000)
+        ids = found.column("id").to_pylist()
+        if expected in ids:
+            hits += 1
+            reciprocal_ranks += 1 / (ids.index(expected) + 1)
+    return {
+        "hit_rate": hits / len(queries),
+        "mrr": reciprocal_ranks / len(queries),
+        "p50": float(np.percentile(latencies, 50)),
+        "p99": float(np.percentile(latencies, 99)),
+    }
+
+
+def main():
+    args = parse_args()
+    table = lancedb.connect("data/lancedb").open_table(args.table)
+    func = get_embedding_function()
+
+    queries = make_queries(table, args.queries, args.query_words)
+    if not queries:
+        print("❌ В таблице нет фрагментов достаточной длины")
+        return
+    print(f"🔍 {len(queries)} запросов по {args.query_words} слов, модель эмбеддингов: {func.name}")
+
+    # Задержка векторного и гибридного режимов включает запрос эмбеддинга - кэш не используется
+    results = {}
+    for mode in SEARCH_MODES:
+        results[mode] = measure(table, mode, queries, args.k, func)
+        print(f"  ✅ {mode}")
+
+    print("\n" + "="*60)
+    print(f"📊 HIT RATE@{args.k} / MRR / ЗАДЕРЖКА:")
+    print("="*60)
+    print(f"{'Режим':<10}{'Hit rate':>10}{'MRR':>8}{'p50, мс':>10}{'p99, мс':>10}")
+    for mode, stats in results.items():
+        print(
+            f"{mode:<10}{stats['hit_rate']:>10.3f}{stats['mrr']:>8.3f}"
+            f"{stats['p50']:>10.2f}{stats['p99']:>10.2f}"
+        )
+    print("\nℹ️ Запросы - дословные отрывки, это выгодно лексическому поиску;")
+    print("   перефразированные вопросы пользователей лучше находит векторный и гибридный поиск")
+
+
+if __name__ == "__main__":
+    main()
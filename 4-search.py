@@ -1,5 +1,13 @@
+import time
+
 import lancedb
-from lancedb.embeddings import get_registry
+from dotenv import load_dotenv
+
+from utils.embeddings import get_embedding_function
+from utils.search import build_filter, retrieve, search_batch, search_chunks
+from utils.table_stats import load_catalog
+
+load_dotenv()
 
 # Подключение к базе данных
 print("🔍 Подключаюсь к векторной базе LanceDB...")
@@ -8,8 +16,11 @@ table = db.open_table("docling")
 
 print(f"📊 В базе данных: {table.count_rows()} записей")
 
-# Настройка поиска
-func = get_registry().get("openai").create(name="text-embedding-3-small")
+# Настройка поиска: провайдер эмбеддингов из EMBEDDING_PROVIDER (openai | onnx | hashing).
+# Импорт utils.embeddings регистрирует локальные провайдеры, которые таблица
+# восстанавливает из своей схемы при поиске по тексту
+func = get_embedding_function()
+print(f"🧠 Модель эмбеддингов: {func.name}")
 
 # Тестовые запросы по вашему документу о логике продаж
 test_queries = [
@@ -25,29 +36,60 @@ print("\n" + "="*60)
 print("ТЕСТИРОВАНИЕ ПОИСКА ПО ДОКУМЕНТУ О ЛОГИКЕ ПРОДАЖ:")
 print("="*60)
 
-for query in test_queries:
+# Все запросы эмбеддятся одним вызовом и ищутся одним многовекторным запросом
+started = time.perf_counter()
+batch_results = search_batch(table, test_queries, limit=2, func=func)
+print(f"⏱️ {len(test_queries)} запросов за {time.perf_counter() - started:.2f} с")
+
+for query, results in zip(test_queries, batch_results):
     print(f"\n🔍 Запрос: '{query}'")
-    results = table.search(query).limit(2).to_pandas()
-    
-    if len(results) > 0:
-        for i, row in results.iterrows():
+
+    if results.num_rows > 0:
+        for i, row in enumerate(results.to_pylist()):
             print(f"  📄 Результат {i+1}:")
             print(f"     Релевантность: {row['_distance']:.4f}")
             print(f"     Файл: {row['metadata']['filename']}")
             print(f"     Заголовок: {row['metadata']['title']}")
+            print(f"     Раздел: {row['section']}")
+            if row["page_start"]:
+                print(f"     Страницы: {row['page_start']}-{row['page_end']}")
             print(f"     Текст: {row['text'][:150]}...")
             print()
     else:
         print("  ❌ Результатов не найдено")
 
+# Поиск с предварительным фильтром: векторный поиск идёт только по строкам,
+# отобранным скалярными индексами (документ, раздел, дата загрузки, страница)
+first = search_chunks(table, test_queries[0], limit=1, columns=["doc_id", "section"]).to_list()
+if first:
+    where = build_filter(doc_ids=first[0]["doc_id"], section=first[0]["section"])
+    print(f"\n🎯 Поиск внутри раздела '{first[0]['section']}'")
+    print(f"   Фильтр: {where}")
+    filtered = search_chunks(table, test_queries[1], limit=2, where=where).to_pandas()
+    for i, row in filtered.iterrows():
+        print(f"  📄 {i+1}. [{row['_distance']:.4f}] {row['text'][:100]}...")
+
+# Точные термины ищутся по полнотекстовому индексу без запроса к API эмбеддингов,
+# гибридный режим объединяет ранги BM25 и векторного поиска (reciprocal rank fusion)
+for mode, query in (("lexical", "KPI"), ("hybrid", "Этапы продажи тестового периода")):
+    started = time.perf_counter()
+    results = retrieve(table, query, mode, limit=2, columns=["text"], func=func)
+    print(f"\n🔤 Режим {mode}: '{query}' ({(time.perf_counter() - started) * 1000:.0f} мс)")
+    for i, row in enumerate(results.to_pylist()):
+        print(f"  📄 {i+1}. {row['text'][:100]}...")
+
 print("\n" + "="*60)
 print("СТАТИСТИКА БАЗЫ ЗНАНИЙ:")
 print("="*60)
-print(f"📈 Всего фрагментов в базе: {table.count_rows()}")
+# Статистика берётся из каталога, который поддерживает загрузка; таблица не сканируется
+catalog = load_catalog(table)
+summary = catalog.summary()
+print(f"📈 Всего фрагментов в базе: {summary['rows']}")
+print(f"📚 Документов: {summary['documents']}, разделов: {summary['sections']}")
+print(f"💽 Текст: {summary['text_chars']} символов, векторы: ~{summary['vector_bytes'] / 1024**2:.1f} МБ")
+print(f"🕒 Последняя загрузка: {summary['last_ingested']}")
 
-# Проверяем разнообразие заголовков
-sample_data = table.to_pandas()
-unique_titles = sample_data['metadata'].apply(lambda x: x['title']).unique()
+unique_titles = summary["titles"]
 print(f"📋 Уникальных заголовков: {len(unique_titles)}")
 print("🏷️ Примеры заголовков:")
 for title in unique_titles[:5]:
@@ -1,8 +1,17 @@
+import html
+import os
+from typing import List
+
 import streamlit as st
 import lancedb
 from openai import OpenAI
 from dotenv import load_dotenv
 
+from utils.embedding_cache import EmbeddingCache, QueryEmbeddingCache
+from utils.embeddings import get_embedding_function
+from utils.search import RESULT_COLUMNS, SearchResult, build_filter, retrieve, to_results
+from utils.table_stats import load_catalog
+
 # Load environment variables
 load_dotenv()
 
@@ -18,40 +27,80 @@ def init_db():
     Returns:
         LanceDB table object
     """
+    # Загружаем модель эмбеддингов один раз (для onnx это локальная модель из models_cache/)
+    get_embedding_function()
     db = lancedb.connect("data/lancedb")
     return db.open_table("docling")
 
 
-def get_context(query: str, table, num_results: int = 4) -> str:
+@st.cache_resource
+def init_query_cache():
+    """Query vector cache shared by all sessions.
+
+    Repeated and example questions are answered without an embedding request.
+    QUERY_CACHE_PATH also keeps the vectors on disk between restarts.
+    """
+    path = os.getenv("QUERY_CACHE_PATH")
+    disk = EmbeddingCache(path) if path else None
+    return QueryEmbeddingCache(get_embedding_function(), disk=disk)
+
+
+def list_documents(table) -> list:
+    """Ids of all documents in the table, for the search filter (from the stats catalog)."""
+    return sorted(load_catalog(table).documents)
+
+
+def get_context(
+    query: str,
+    table,
+    query_cache,
+    num_results: int = 4,
+    where: str = None,
+    mode: str = "hybrid",
+) -> List[SearchResult]:
     """Search the database for relevant context.
 
     Args:
         query: User's question
         table: LanceDB table object
+        query_cache: QueryEmbeddingCache the question vector comes from
         num_results: Number of results to return
+        where: Prefilter from build_filter() (None searches everything)
+        mode: "hybrid", "vector" or "lexical" (no embedding request)
 
     Returns:
-        str: Concatenated context from relevant chunks with source information
+        List[SearchResult]: Relevant chunks, best first
     """
-    results = table.search(query).limit(num_results).to_pandas()
-    contexts = []
-
-    for _, row in results.iterrows():
-        # Extract metadata - в новой структуре только filename и title
-        filename = row["metadata"]["filename"]
-        title = row["metadata"]["title"]
+    rows = retrieve(
+        table,
+        query,
+        mode,
+        limit=num_results,
+        where=where,
+        columns=RESULT_COLUMNS,
+        query_cache=query_cache,
+    )
+    return to_results(rows)
 
-        # Build source citation
-        source_parts = []
-        if filename:
-            source_parts.append(filename)
 
-        source = f"\nSource: {' - '.join(source_parts)}"
-        if title:
-            source += f"\nTitle: {title}"
+def format_source(result: SearchResult) -> str:
+    """Citation of a chunk: file name and pages."""
+    source_parts = []
+    if result.filename:
+        source_parts.append(result.filename)
+    if result.page_start:
+        source_parts.append(f"стр. {result.page_start}-{result.page_end}")
+    return " - ".join(source_parts) or "Неизвестный источник"
 
-        contexts.append(f"{row['text']}{source}")
 
+def build_context(results: List[SearchResult]) -> str:
+    """Concatenated context for the prompt, with source information for every chunk."""
+    contexts = []
+    for result in results:
+        source = f"\nSource: {format_source(result)}"
+        if result.title:
+            source += f"\nTitle: {result.title}"
+        contexts.append(f"{result.text}{source}")
     return "\n\n".join(contexts)
 
 
@@ -100,11 +149,20 @@ if "messages" not in st.session_state:
 
 # Initialize database connection
 table = init_db()
+query_cache = init_query_cache()
 
 # Отображаем статистику базы знаний
 with st.sidebar:
     st.header("Информация о базе знаний")
     st.metric("Количество фрагментов", table.count_rows())
+
+    # Фильтр по документу: поиск идёт только по его фрагментам
+    documents = list_documents(table)
+    selected_documents = st.multiselect("Искать только в документах:", documents)
+
+    # Гибридный поиск объединяет BM25 и векторы, лексический не вызывает API эмбеддингов
+    search_modes = {"Гибридный": "hybrid", "Векторный": "vector", "Лексический": "lexical"}
+    search_mode = search_modes[st.radio("Режим поиска:", list(search_modes))]
     
     # Отображаем примеры возможных вопросов
     st.subheader("Примеры вопросов:")
@@ -116,6 +174,8 @@ with st.sidebar:
         "Как делать микропрезентацию клиенту?",
         "Что нужно объяснить клиенту про KPI?"
     ]
+    # Векторы примеров считаются одним запросом и дальше берутся из кэша
+    query_cache.embed(example_questions)
     
     for q in example_questions:
         if st.button(q):
@@ -142,7 +202,13 @@ if prompt:
 
     # Get relevant context
     with st.status("Поиск информации в документе...", expanded=False) as status:
-        context = get_context(prompt, table)
+        results = get_context(
+            prompt,
+            table,
+            query_cache,
+            where=build_filter(doc_ids=selected_documents),
+            mode=search_mode,
+        )
         st.markdown(
             """
             <style>
@@ -171,26 +237,15 @@ if prompt:
         )
 
         st.write("Найденные релевантные фрагменты:")
-        for chunk in context.split("\n\n"):
-            # Split into text and metadata parts
-            parts = chunk.split("\n")
-            text = parts[0]
-            metadata = {
-                line.split(": ")[0]: line.split(": ")[1]
-                for line in parts[1:]
-                if ": " in line
-            }
-
-            source = metadata.get("Source", "Неизвестный источник")
-            title = metadata.get("Title", "Без заголовка")
-
+        for result in results:
+            # Текст фрагментов попадает в HTML, поэтому экранируется
             st.markdown(
                 f"""
                 <div class="search-result">
                     <details>
-                        <summary>{title}</summary>
-                        <div class="metadata">Источник: {source}</div>
-                        <div style="margin-top: 8px;">{text}</div>
+                        <summary>{html.escape(result.section or result.title or "Без заголовка")}</summary>
+                        <div class="metadata">Источник: {html.escape(format_source(result))}</div>
+                        <div style="margin-top: 8px; white-space: pre-wrap;">{html.escape(result.text)}</div>
                     </details>
                 </div>
             """,
@@ -200,7 +255,7 @@ if prompt:
     # Display assistant response first
     with st.chat_message("assistant"):
         # Get model response with streaming
-        response = get_chat_response(st.session_state.messages, context)
+        response = get_chat_response(st.session_state.messages, build_context(results))
 
     # Add assistant response to chat history
     st.session_state.messages.append({"role": "assistant", "content": response})
@@ -0,0 +1,233 @@
+import glob
+import json
+import multiprocessing
+import os
+import pathlib
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+SUPPORTED_EXTENSIONS = (".pdf", ".md", ".html", ".htm", ".docx", ".pptx")
+
+# Conversion cache of the current worker process, created once in _init_worker.
+# Warm DocumentConverters are kept per profile by utils.profiles.get_converter.
+_cache = None
+
+
+@dataclass
+class BatchResult:
+    """Outcome of converting a single file in a batch."""
+
+    source: str
+    seconds: float
+    markdown_path: Optional[str] = None
+    json_path: Optional[str] = None
+    error: Optional[str] = None
+    profile: Optional[str] = None
+    # Seconds per page spent in every pipeline stage (empty for cache hits)
+    page_timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def collect_sources(
+    pattern: str, extensions: Tuple[str, ...] = SUPPORTED_EXTENSIONS
+) -> List[str]:
+    """Resolves a file, a directory or a glob pattern into a sorted list of files.
+
+    Args:
+        pattern: Path to a file, a directory (searched recursively) or a glob
+        extensions: File extensions to keep
+
+    Returns:
+        Sorted list of supported document paths
+    """
+    path = pathlib.Path(pattern)
+    if path.is_file():
+        return [str(path)]
+    if path.is_dir():
+        candidates = (str(p) for p in path.rglob("*") if p.is_file())
+    else:
+        candidates = glob.glob(pattern, recursive=True)
+
+    return sorted(
+        p for p in candidates if pathlib.Path(p).suffix.lower() in extensions
+    )
+
+
+def collect_documents(
+    pattern: str, extensions: Tuple[str, ...] = SUPPORTED_EXTENSIONS
+) -> List[str]:
+    """Like collect_sources, but prefers each document's DoclingDocument export.
+
+    A file with a ``.json`` export next to it (same path without the
+    extension, as written by the extraction scripts) is replaced by the
+    export; files without one are kept as they are.
+
+    Returns:
+        Sorted list of JSON exports and source documents
+    """
+    files = collect_sources(pattern, extensions=tuple(extensions) + (".json",))
+    exported = {os.path.splitext(p)[0] for p in files if p.lower().endswith(".json")}
+    return [
+        p for p in files
+        if p.lower().endswith(".json") or os.path.splitext(p)[0] not in exported
+    ]
+
+
+def _init_worker(num_threads: int, cache_dir: Optional[str], profile: str) -> None:
+    """Creates one warm DocumentConverter per worker process."""
+    global _cache
+
+    # Split the cores between workers instead of letting every worker use all of them
+    os.environ["OMP_NUM_THREADS"] = str(num_threads)
+
+    from utils.profiles import PROFILES, get_converter
+
+    get_converter(profile if profile in PROFILES else "balanced")
+
+    if cache_dir:
+        from utils.conversion_cache import ConversionCache
+
+        _cache = ConversionCache(cache_dir)
+
+
+def _convert_windowed(
+    source: str, stem: str, window_pages: int, profile: str
+) -> BatchResult:
+    from utils.profiles import choose_profile, get_converter
+    from utils.streaming import convert_in_windows
+
+    started = time.perf_counter()
+    if profile == "auto":
+        profile, _ = choose_profile(source)
+
+    output_dir = os.path.dirname(stem)
+    converter = get_converter(profile)
+    for _ in convert_in_windows(converter, source, output_dir, window_pages):
+        pass
+
+    return BatchResult(
+        source=source,
+        seconds=time.perf_counter() - started,
+        markdown_path=f"{stem}.md",
+        profile=profile,
+    )
+
+
+def _convert_one(
+    source: str,
+    markdown_path: str,
+    json_path: str,
+    window_pages: Optional[int],
+    profile: str,
+) -> BatchResult:
+    started = time.perf_counter()
+    try:
+        if window_pages and source.lower().endswith(".pdf"):
+            from utils.streaming import count_pages
+
+            # Large PDFs are converted page window by page window to bound memory
+            if count_pages(source) > window_pages:
+                return _convert_windowed(
+                    source, markdown_path[: -len(".md")], window_pages, profile
+                )
+
+        from utils.profiles import convert_with_profile
+
+        document, report = convert_with_profile(source, profile, _cache)
+
+        with open(markdown_path, "w", encoding="utf-8") as f:
+            f.write(document.export_to_markdown())
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(document.export_to_dict(), f, ensure_ascii=False)
+
+        return BatchResult(
+            source=source,
+            seconds=time.perf_counter() - started,
+            markdown_path=markdown_path,
+            json_path=json_path,
+            profile=report.profile,
+            page_timings=report.page_timings,
+        )
+    except Exception as e:
+        return BatchResult(
+            source=source,
+            seconds=time.perf_counter() - started,
+            error=f"{type(e).__name__}: {e}",
+        )
+
+
+def _output_stem(source: str, root: str, output_dir: pathlib.Path) -> pathlib.Path:
+    relative = pathlib.Path(os.path.relpath(source, root))
+    target = output_dir / relative.with_suffix("")
+    target.parent.mkdir(parents=True, exist_ok=True)
+    return target
+
+
+def convert_batch(
+    sources: List[str],
+    output_dir: str = "extracted",
+    workers: Optional[int] = None,
+    cache_dir: Optional[str] = "conversion_cache",
+    window_pages: Optional[int] = None,
+    profile: str = "auto",
+) -> Iterator[BatchResult]:
+    """Converts many documents in parallel, one warm DocumentConverter per process.
+
+    Markdown and JSON exports are written to ``output_dir``, mirroring the
+    relative layout of the sources. A failing file does not stop the batch:
+    its error is reported in the corresponding BatchResult.
+
+    Args:
+        sources: Paths of the documents to convert
+        output_dir: Directory for the markdown/JSON results
+        workers: Number of worker processes (default: number of CPU cores)
+        cache_dir: Conversion cache directory shared by the workers, None disables it
+        window_pages: Convert PDFs longer than this many pages in page windows
+            (see utils.streaming.convert_in_windows)
+        profile: Conversion profile, see utils.profiles (default: chosen per file)
+
+    Yields:
+        BatchResult for every source, in completion order
+    """
+    if not sources:
+        return
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(sources)))
+    num_threads = max(1, (os.cpu_count() or 1) // workers)
+
+    out = pathlib.Path(output_dir)
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(s)) for s in sources])
+
+    # "spawn" avoids inheriting torch state from the parent process
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(num_threads, cache_dir, profile),
+    ) as pool:
+        futures = {}
+        for source in sources:
+            stem = _output_stem(os.path.abspath(source), root, out)
+            future = pool.submit(
+                _convert_one,
+                source,
+                f"{stem}.md",
+                f"{stem}.json",
+                window_pages,
+                profile,
+            )
+            futures[future] = source
+
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                # The worker itself died (e.g. out of memory)
+                yield BatchResult(
+                    source=futures[future], seconds=0.0, error=f"{type(e).__name__}: {e}"
+                )
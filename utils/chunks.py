@@ -0,0 +1,51 @@
+import hashlib
+from dataclasses import dataclass, field
+from typing import List
+
+
+@dataclass
+class ChunkRecord:
+    """A chunk detached from its DoclingDocument, cheap to pickle and to store."""
+
+    doc_id: str
+    index: int
+    text: str
+    headings: List[str] = field(default_factory=list)
+    filename: str = "unknown"
+    # Pages of the document items the chunk was built from (empty for formats without pages)
+    pages: List[int] = field(default_factory=list)
+
+    @property
+    def chunk_id(self) -> str:
+        return f"{self.doc_id}#{self.index}"
+
+    @property
+    def title(self) -> str:
+        return self.headings[0] if self.headings else "Untitled"
+
+    @property
+    def content_hash(self) -> str:
+        return hashlib.sha256(self.text.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def from_doc_chunk(cls, doc_id: str, index: int, chunk) -> "ChunkRecord":
+        """Builds a record from a docling DocChunk."""
+        meta = getattr(chunk, "meta", None)
+        headings = list(getattr(meta, "headings", None) or [])
+        origin = getattr(meta, "origin", None)
+        filename = getattr(origin, "filename", None) or "unknown"
+        pages = sorted(
+            {
+                prov.page_no
+                for item in getattr(meta, "doc_items", None) or []
+                for prov in getattr(item, "prov", None) or []
+            }
+        )
+        return cls(
+            doc_id=doc_id,
+            index=index,
+            text=chunk.text,
+            headings=headings,
+            filename=filename,
+            pages=pages,
+        )
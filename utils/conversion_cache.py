@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import pathlib
+from importlib.metadata import PackageNotFoundError, version
+from typing import Optional
+
+from docling_core.types.doc import DoclingDocument
+
+DEFAULT_CACHE_DIR = "conversion_cache"
+DEFAULT_MAX_BYTES = 2 * 1024**3  # 2 GB
+
+
+def _docling_version() -> str:
+    try:
+        return version("docling")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def options_fingerprint(converter) -> str:
+    """Builds a stable string describing the pipeline options of a DocumentConverter.
+
+    Args:
+        converter: docling DocumentConverter
+
+    Returns:
+        JSON string with the pipeline/backend configuration of every input format
+    """
+    options = {}
+    for input_format, format_option in converter.format_to_options.items():
+        pipeline_options = format_option.pipeline_options
+        options[str(input_format)] = {
+            "backend": format_option.backend.__name__,
+            "pipeline": format_option.pipeline_cls.__name__,
+            "options": (
+                pipeline_options.model_dump(mode="json") if pipeline_options else None
+            ),
+        }
+    return json.dumps(options, sort_keys=True, default=str)
+
+
+class ConversionCache:
+    """Persistent content-addressed cache of converted DoclingDocuments.
+
+    Entries are keyed by the sha256 of the source file, the docling version and
+    the pipeline options, so an unchanged input is never converted twice. The
+    cache is bounded by size and evicts the least recently used entries first.
+    """
+
+    def __init__(
+        self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        """Initialize the cache.
+
+        Args:
+            cache_dir: Directory where serialized documents are stored
+            max_bytes: Maximum total size of the cache on disk
+        """
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def key(self, source: str, options: str = "") -> str:
+        """Computes the cache key of a local source file.
+
+        Args:
+            source: Path to the source document
+            options: Pipeline options fingerprint (see options_fingerprint)
+
+        Returns:
+            Hex digest identifying the conversion result
+        """
+        digest = hashlib.sha256()
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+
+        digest.update(b"\0" + _docling_version().encode())
+        digest.update(b"\0" + options.encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[DoclingDocument]:
+        """Returns the cached document or None on a miss."""
+        path = self._path(key)
+        try:
+            data = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+        # Refresh mtime so that eviction is least-recently-used; another
+        # process may have evicted the entry since it was read
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return DoclingDocument.model_validate_json(data)
+
+    def put(self, key: str, document: DoclingDocument) -> None:
+        """Stores a document and evicts old entries if the cache is too large."""
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(document.model_dump_json(), encoding="utf-8")
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self) -> int:
+        """Removes least recently used entries until the cache fits max_bytes.
+
+        Returns:
+            Number of removed entries
+        """
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+
+def convert_cached(
+    converter, source: str, cache: Optional[ConversionCache] = None
+) -> DoclingDocument:
+    """Converts a local document, reusing a cached result when available.
+
+    Args:
+        converter: docling DocumentConverter
+        source: Path to the source document
+        cache: Conversion cache (default: ConversionCache() in conversion_cache/)
+
+    Returns:
+        The converted DoclingDocument
+
+    Raises:
+        ValueError: If docling did not produce a document
+    """
+    cache = cache or ConversionCache()
+    key = cache.key(source, options_fingerprint(converter))
+
+    document = cache.get(key)
+    if document is not None:
+        return document
+
+    document = converter.convert(source).document
+    if document is None:
+        raise ValueError(f"Document was not produced for {source}")
+
+    cache.put(key, document)
+    return document
@@ -0,0 +1,236 @@
+import argparse
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from utils.profiles import DEFAULT_PROFILE, PROFILES
+
+DEFAULT_SERVER_URL = "http://127.0.0.1:8765"
+
+
+def _server_url() -> str:
+    return os.environ.get("CONVERSION_SERVER_URL", DEFAULT_SERVER_URL).rstrip("/")
+
+
+# --------------------------------------------------------------
+# Server
+# --------------------------------------------------------------
+
+
+class ConversionService:
+    """Keeps DocumentConverters resident and limits concurrent conversions.
+
+    Converters are built once per conversion profile (the default one at
+    warm-up, others on their first job) and results go through the
+    conversion cache.
+
+    At most ``max_concurrency`` conversions run at once and at most
+    ``max_queue`` more may wait for a slot; further jobs are rejected.
+    """
+
+    def __init__(self, max_concurrency: int = 1, max_queue: int = 16):
+        from utils.conversion_cache import ConversionCache
+
+        self.cache = ConversionCache()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._max_pending = max_concurrency + max_queue
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def warm_up(self) -> None:
+        """Loads the PDF pipeline models of the default profile before the first job arrives."""
+        from docling.datamodel.base_models import InputFormat
+
+        from utils.profiles import get_converter
+
+        get_converter(DEFAULT_PROFILE).initialize_pipeline(InputFormat.PDF)
+
+    def convert(self, source: str, profile: str = DEFAULT_PROFILE) -> Optional[str]:
+        """Converts a document and returns its DoclingDocument JSON.
+
+        Args:
+            source: Path to the source document
+            profile: One of PROFILES, or "auto" to choose from the PDF text layer
+
+        Returns:
+            Serialized document, or None if the job queue is full
+        """
+        from utils.profiles import convert_with_profile
+
+        with self._lock:
+            if self._pending >= self._max_pending:
+                return None
+            self._pending += 1
+
+        try:
+            with self._slots:
+                document, _ = convert_with_profile(source, profile, self.cache)
+            return document.model_dump_json()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service: ConversionService = None
+
+    def _send_json(self, status: int, payload) -> None:
+        body = payload if isinstance(payload, str) else json.dumps(payload)
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/convert":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length))
+            source = payload["source"]
+            profile = payload.get("profile", DEFAULT_PROFILE)
+            if not isinstance(source, str):
+                raise TypeError("source must be a string")
+            if profile != "auto" and profile not in PROFILES:
+                raise ValueError(f"unknown profile '{profile}'")
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": f"Bad request: {e}"})
+            return
+
+        if not os.path.isfile(source):
+            self._send_json(404, {"error": f"File not found: {source}"})
+            return
+
+        try:
+            document_json = self.service.convert(source, profile)
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+
+        if document_json is None:
+            self._send_json(503, {"error": "Conversion queue is full"})
+        else:
+            self._send_json(200, document_json)
+
+    def log_message(self, format, *args):
+        print(f"🌐 {self.address_string()} - {format % args}")
+
+
+def serve(
+    host: str = "127.0.0.1", port: int = 8765, max_concurrency: int = 1, max_queue: int = 16
+) -> None:
+    """Runs the conversion server until interrupted."""
+    print("🤖 Загружаю модели docling...")
+    _Handler.service = ConversionService(max_concurrency, max_queue)
+    _Handler.service.warm_up()
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    print(f"✅ Сервер конвертации запущен: http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# --------------------------------------------------------------
+# Client
+# --------------------------------------------------------------
+
+
+def server_available(url: Optional[str] = None, timeout: float = 0.2) -> bool:
+    """Checks whether a conversion server is listening at the given URL."""
+    try:
+        with urllib.request.urlopen(f"{url or _server_url()}/health", timeout=timeout):
+            return True
+    except (urllib.error.URLError, OSError):
+        return False
+
+
+def remote_convert(
+    source: str,
+    url: Optional[str] = None,
+    timeout: float = 600,
+    profile: str = DEFAULT_PROFILE,
+):
+    """Converts a local document on the conversion server.
+
+    Args:
+        source: Path to the source document
+        url: Server URL (default: $CONVERSION_SERVER_URL or http://127.0.0.1:8765)
+        timeout: Request timeout in seconds
+        profile: Conversion profile, one of PROFILES or "auto"
+
+    Returns:
+        The converted DoclingDocument
+
+    Raises:
+        ValueError: If the server rejected or failed the job
+    """
+    from docling_core.types.doc import DoclingDocument
+
+    request = urllib.request.Request(
+        f"{url or _server_url()}/convert",
+        data=json.dumps({"source": os.path.abspath(source), "profile": profile}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return DoclingDocument.model_validate_json(response.read())
+    except urllib.error.HTTPError as e:
+        raise ValueError(f"Conversion server error {e.code}: {e.read().decode()}")
+
+
+def convert_document(source: str, converter=None):
+    """Converts a local document, preferring a running conversion server.
+
+    Falls back to an in-process (cached) conversion when no server is running.
+
+    Args:
+        source: Path to the source document
+        converter: DocumentConverter for the fallback (default: the process-wide
+            converter of the default profile, so models are loaded once)
+
+    Returns:
+        The converted DoclingDocument
+    """
+    if server_available():
+        return remote_convert(source)
+
+    from utils.conversion_cache import convert_cached
+
+    if converter is None:
+        from utils.profiles import get_converter
+
+        converter = get_converter(DEFAULT_PROFILE)
+    return convert_cached(converter, source)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сервер конвертации документов docling")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, default=1, help="Одновременных конвертаций")
+    parser.add_argument("--queue", type=int, default=16, help="Максимум задач в очереди")
+    args = parser.parse_args()
+
+    from utils.hf_cache import setup_local_cache
+
+    setup_local_cache()
+    serve(args.host, args.port, args.concurrency, args.queue)
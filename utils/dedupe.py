@@ -0,0 +1,160 @@
+import hashlib
+import re
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.chunks import ChunkRecord
+
+# Price of text-embedding-3-small, USD per 1M tokens
+EMBEDDING_PRICE_PER_1M = 0.02
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercases text and drops punctuation and whitespace differences."""
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+@dataclass
+class DedupeReport:
+    """What deduplication removed and what it saves on embedding."""
+
+    total: int = 0
+    kept: int = 0
+    exact_duplicates: int = 0
+    near_duplicates: int = 0
+    chars_saved: int = 0
+    tokens_saved: int = 0
+
+    @property
+    def cost_saved(self) -> float:
+        return self.tokens_saved / 1_000_000 * EMBEDDING_PRICE_PER_1M
+
+
+@dataclass
+class DedupeResult:
+    """Canonical chunks in their original order with the chunks they replace."""
+
+    canonical: List[ChunkRecord]
+    # chunk_id of every canonical chunk -> chunk_ids of all chunks it stands for
+    sources: Dict[str, List[str]] = field(default_factory=dict)
+    report: DedupeReport = field(default_factory=DedupeReport)
+
+
+class MinHasher:
+    """MinHash signatures over word shingles with LSH banding."""
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, shingle_size: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+        self.b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+    def signature(self, text: str) -> np.ndarray:
+        words = text.split()
+        size = min(self.shingle_size, max(1, len(words)))
+        shingles = {" ".join(words[i : i + size]) for i in range(max(1, len(words) - size + 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) % _MERSENNE_PRIME for s in shingles),
+            dtype=np.int64,
+            count=len(shingles),
+        )
+        # (a * x + b) mod p for every permutation at once; the product fits in int64
+        permuted = (np.outer(self.a, hashes) + self.b[:, None]) % _MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+    def band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            bytes([band]) + signature[band * self.rows : (band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+
+def deduplicate(
+    records: List[ChunkRecord], threshold: float = 0.9, tokenizer=None
+) -> DedupeResult:
+    """Drops exact and near-duplicate chunks, keeping the first occurrence.
+
+    Exact duplicates are found by the hash of the normalized text, near
+    duplicates by MinHash/LSH candidates whose estimated Jaccard similarity of
+    word shingles is at least ``threshold``.
+
+    Args:
+        records: Chunks in their original order
+        threshold: Minimum estimated similarity for near duplicates
+        tokenizer: OpenAITokenizerWrapper used to report saved tokens (optional)
+
+    Returns:
+        Canonical chunks, their source references and a report
+    """
+    report = DedupeReport(total=len(records))
+    canonical_of: List[int] = list(range(len(records)))
+    normalized = [normalize(record.text) for record in records]
+
+    # Exact duplicates
+    first_by_hash: Dict[str, int] = {}
+    for i, text in enumerate(normalized):
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if digest in first_by_hash:
+            canonical_of[i] = first_by_hash[digest]
+            report.exact_duplicates += 1
+        else:
+            first_by_hash[digest] = i
+
+    # Near duplicates among the remaining chunks
+    hasher = MinHasher()
+    signatures: Dict[int, np.ndarray] = {}
+    buckets: Dict[bytes, List[int]] = {}
+    for i, text in enumerate(normalized):
+        if canonical_of[i] != i:
+            continue
+        signature = hasher.signature(text)
+        signatures[i] = signature
+
+        keys = hasher.band_keys(signature)
+        match: Optional[int] = None
+        for key in keys:
+            for j in buckets.get(key, ()):
+                if np.mean(signatures[j] == signature) >= threshold:
+                    match = j
+                    break
+            if match is not None:
+                break
+
+        if match is not None:
+            canonical_of[i] = match
+            report.near_duplicates += 1
+        else:
+            # Only canonical chunks are candidates, so a match is always a root
+            for key in keys:
+                buckets.setdefault(key, []).append(i)
+
+    # An exact copy of a near duplicate points at it; follow such links to the root
+    for i, parent in enumerate(canonical_of):
+        while canonical_of[parent] != parent:
+            parent = canonical_of[parent]
+        canonical_of[i] = parent
+
+    result = DedupeResult(canonical=[], report=report)
+    for i, record in enumerate(records):
+        root = canonical_of[i]
+        if root == i:
+            result.canonical.append(record)
+            result.sources[record.chunk_id] = [record.chunk_id]
+        else:
+            result.sources[records[root].chunk_id].append(record.chunk_id)
+            report.chars_saved += len(record.text)
+            if tokenizer is not None:
+                report.tokens_saved += tokenizer.count_tokens(record.text)
+
+    report.kept = len(result.canonical)
+    return result
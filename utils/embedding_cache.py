@@ -0,0 +1,288 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import wraps
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.embeddings import embed_queries
+
+DEFAULT_CACHE_PATH = "data/embedding_cache.sqlite"
+DEFAULT_MAX_BYTES = 1024**3  # 1 GB
+DEFAULT_MAX_AGE_DAYS = 90
+DEFAULT_QUERY_CACHE_SIZE = 1024
+# Size eviction frees space down to this share of max_bytes, so it does not rerun on every write
+EVICT_TO_RATIO = 0.9
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def normalize_query(query: str) -> str:
+    """Case and whitespace differences do not change a query's cache key."""
+    return " ".join(query.split()).casefold()
+
+
+def _locked(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class EmbeddingCache:
+    """Persistent SQLite cache of embedding vectors.
+
+    Vectors are keyed by the model name, the number of dimensions and the
+    sha256 of the text, so a chunk is embedded once per model no matter how
+    many times ingestion runs. Entries unused for ``max_age_days`` are
+    dropped when the cache is opened. The total size of the vectors is kept
+    up to date on every write, and once it exceeds ``max_bytes`` the least
+    recently used entries are dropped.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age_days: Optional[float] = DEFAULT_MAX_AGE_DAYS,
+    ):
+        """Initialize the cache.
+
+        Args:
+            path: SQLite database file
+            max_bytes: Maximum total size of stored vectors
+            max_age_days: Entries not used for this long are evicted (None keeps them)
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.stats = CacheStats()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Shared between ingest worker threads, access is serialized by the lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.RLock()
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dims INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, dims, text_hash)
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self.conn.commit()
+        (self._total_bytes,) = self.conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()
+        self.evict()
+
+    @_locked
+    def get_many(self, model: str, dims: int, hashes: List[str]) -> Dict[str, List[float]]:
+        """Looks up vectors by text hash and updates hit/miss counters.
+
+        Returns:
+            Mapping of text hash to vector for the hashes found in the cache
+        """
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(hashes))
+        # SQLite limits the number of bound parameters per statement
+        for start in range(0, len(unique), 500):
+            batch = unique[start : start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.conn.execute(
+                f"SELECT text_hash, vector FROM embeddings "
+                f"WHERE model = ? AND dims = ? AND text_hash IN ({placeholders})",
+                (model, dims, *batch),
+            )
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+        if found:
+            self.conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND dims = ? AND text_hash = ?",
+                [(time.time(), model, dims, key) for key in found],
+            )
+            self.conn.commit()
+
+        self.stats.hits += sum(1 for key in hashes if key in found)
+        self.stats.misses += sum(1 for key in hashes if key not in found)
+        return found
+
+    @_locked
+    def put_many(self, model: str, dims: int, vectors: Dict[str, List[float]]) -> None:
+        """Stores vectors by text hash, evicting LRU entries if the cache gets too big."""
+        now = time.time()
+        rows = [
+            (model, dims, key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, vector in vectors.items()
+        ]
+        # Replaced entries no longer count towards the size (primary key lookups)
+        for _, _, key, _, _ in rows:
+            replaced = self.conn.execute(
+                "SELECT LENGTH(vector) FROM embeddings "
+                "WHERE model = ? AND dims = ? AND text_hash = ?",
+                (model, dims, key),
+            ).fetchone()
+            if replaced:
+                self._total_bytes -= replaced[0]
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, dims, text_hash, vector, last_used) "
+            "VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        self.conn.commit()
+        self._total_bytes += sum(len(row[3]) for row in rows)
+        if self._total_bytes > self.max_bytes:
+            self._evict_lru()
+
+    def _evict_lru(self) -> int:
+        target = self.max_bytes * EVICT_TO_RATIO
+        stale = []
+        # Walks the last_used index from the oldest entry and stops once enough is freed
+        for rowid, size in self.conn.execute(
+            "SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_used"
+        ):
+            if self._total_bytes <= target:
+                break
+            stale.append((rowid,))
+            self._total_bytes -= size
+        self.conn.executemany("DELETE FROM embeddings WHERE rowid = ?", stale)
+        self.conn.commit()
+        return len(stale)
+
+    @_locked
+    def evict(self) -> int:
+        """Removes expired entries, then least recently used ones above max_bytes.
+
+        Runs when the cache is opened; writes only evict by size.
+
+        Returns:
+            Number of removed entries
+        """
+        removed = 0
+        if self.max_age_days is not None:
+            cutoff = time.time() - self.max_age_days * 86400
+            (expired_bytes,) = self.conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings WHERE last_used < ?",
+                (cutoff,),
+            ).fetchone()
+            removed += self.conn.execute(
+                "DELETE FROM embeddings WHERE last_used < ?", (cutoff,)
+            ).rowcount
+            self._total_bytes -= expired_bytes
+            self.conn.commit()
+
+        if self._total_bytes > self.max_bytes:
+            removed += self._evict_lru()
+        return removed
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class QueryEmbeddingCache:
+    """Query vectors for search, cached in memory and optionally on disk.
+
+    Keys are the model, the number of dimensions and the normalized query
+    text. The in-process LRU answers repeated questions without any I/O; the
+    optional EmbeddingCache keeps them across restarts. Query vectors are
+    stored apart from chunk vectors because some models (e5) embed queries
+    differently from passages.
+    """
+
+    def __init__(
+        self,
+        func,
+        max_entries: int = DEFAULT_QUERY_CACHE_SIZE,
+        disk: Optional[EmbeddingCache] = None,
+    ):
+        """Initialize the cache.
+
+        Args:
+            func: LanceDB embedding function used for queries
+            max_entries: Size of the in-memory LRU
+            disk: Persistent cache behind the LRU (None keeps vectors in memory only)
+        """
+        self.func = func
+        self.model = f"{func.name}:query"
+        self.max_entries = max_entries
+        self.disk = disk
+        self.stats = CacheStats()
+        self._dims: Optional[int] = None
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        # Streamlit serves every session from its own thread
+        self._lock = threading.RLock()
+
+    @property
+    def dims(self) -> int:
+        if self._dims is None:
+            self._dims = self.func.ndims()
+        return self._dims
+
+    @_locked
+    def _remember(self, key: str, vector: List[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def embed(self, queries: List[str]) -> List[List[float]]:
+        """Vectors of the queries; misses are embedded together in one call.
+
+        Returns:
+            One vector per query, in order
+        """
+        keys = [text_hash(normalize_query(query)) for query in queries]
+        vectors: Dict[str, List[float]] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    vectors[key] = self._memory[key]
+
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if missing and self.disk is not None:
+            vectors.update(self.disk.get_many(self.model, self.dims, missing))
+
+        texts = {key: query for key, query in zip(keys, queries) if key not in vectors}
+        if texts:
+            computed = dict(zip(texts, embed_queries(self.func, list(texts.values()))))
+            if self.disk is not None:
+                self.disk.put_many(self.model, self.dims, computed)
+            vectors.update(computed)
+        self.stats.hits += sum(1 for key in keys if key not in texts)
+        self.stats.misses += sum(1 for key in keys if key in texts)
+
+        for key in missing:
+            self._remember(key, vectors[key])
+        return [vectors[key] for key in keys]
+
+    def embed_one(self, query: str) -> List[float]:
+        return self.embed([query])[0]
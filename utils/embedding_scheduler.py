@@ -0,0 +1,293 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+DEFAULT_MODEL = "text-embedding-3-small"
+# The embeddings endpoint accepts at most 2048 inputs and 300k tokens per request
+MAX_BATCH_SIZE = 2048
+DEFAULT_BATCH_TOKENS = 100_000
+
+
+def pack_batches(
+    token_counts: List[int],
+    max_batch_tokens: int = DEFAULT_BATCH_TOKENS,
+    max_batch_size: int = MAX_BATCH_SIZE,
+) -> List[List[int]]:
+    """Groups texts into request batches by token budget, preserving order.
+
+    Args:
+        token_counts: Number of tokens of every text
+        max_batch_tokens: Maximum total tokens per batch
+        max_batch_size: Maximum number of texts per batch
+
+    Returns:
+        Lists of text indexes, one per batch
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for index, tokens in enumerate(token_counts):
+        if current and (
+            current_tokens + tokens > max_batch_tokens or len(current) >= max_batch_size
+        ):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class RateLimiter:
+    """Token bucket for requests per minute and tokens per minute.
+
+    The bucket is monotonic-clock state behind a thread lock, not tied to an
+    event loop, so one limiter keeps counting across asyncio.run() calls
+    (each of which creates a new loop) and across threads.
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Takes the budget of one request if it fits, else returns the seconds to wait."""
+        with self._lock:
+            self._refill()
+            if self._requests >= 1 and self._tokens >= tokens:
+                self._requests -= 1
+                self._tokens -= tokens
+                return 0.0
+            return max(
+                (1 - self._requests) * 60 / self.rpm,
+                (tokens - self._tokens) * 60 / self.tpm,
+                0.01,
+            )
+
+    async def acquire(self, tokens: int) -> None:
+        """Waits until one request with ``tokens`` tokens fits into both limits."""
+        # A batch larger than the whole minute budget would wait forever
+        tokens = min(tokens, self.tpm)
+        while True:
+            wait = self._try_acquire(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+@dataclass
+class SchedulerStats:
+    requests: int = 0
+    retries: int = 0
+    tokens: int = 0
+    seconds: float = 0.0
+
+
+class EmbeddingScheduler:
+    """Embeds texts in token-budgeted batches with concurrent, rate-limited requests.
+
+    Batches are sent through the OpenAI-compatible embeddings API with at most
+    ``concurrency`` requests in flight and within the RPM/TPM limits. Rate
+    limit errors, timeouts and 5xx responses are retried with jittered
+    exponential backoff, honouring Retry-After when the server sends it.
+    Results are handed to a callback as soon as each batch completes.
+    ``base_url`` (or OPENAI_BASE_URL) can point to a local stub server.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[str], int],
+        model: str = DEFAULT_MODEL,
+        dimensions: Optional[int] = None,
+        max_batch_tokens: int = DEFAULT_BATCH_TOKENS,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        concurrency: int = 4,
+        rpm: int = 3000,
+        tpm: int = 1_000_000,
+        max_retries: int = 6,
+        timeout: float = 60.0,
+        base_url: Optional[str] = None,
+        limiter: Optional[RateLimiter] = None,
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            count_tokens: Token counter used for batching and TPM accounting
+            model: Embedding model name
+            dimensions: Requested vector size (None for the model default)
+            max_batch_tokens: Maximum total tokens per request
+            max_batch_size: Maximum number of texts per request
+            concurrency: Maximum number of requests in flight
+            rpm: Requests per minute limit
+            tpm: Tokens per minute limit
+            max_retries: Retries per batch before giving up
+            timeout: Request timeout in seconds
+            base_url: API base URL (default: OPENAI_BASE_URL or the OpenAI API)
+            limiter: RateLimiter shared with other schedulers (replaces rpm/tpm)
+        """
+        self.count_tokens = count_tokens
+        self.model = model
+        self.dimensions = dimensions
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.concurrency = concurrency
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL")
+        self.stats = SchedulerStats()
+        # One bucket for the scheduler's lifetime: every embed() call draws from it
+        self.limiter = limiter or RateLimiter(rpm, tpm)
+
+    @staticmethod
+    def _retry_delay(error, attempt: int) -> float:
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # Full jitter: spreads retries of concurrent batches apart
+        return random.uniform(0, min(30.0, 0.5 * 2**attempt))
+
+    async def _embed_batch(self, client, limiter: RateLimiter, texts: List[str], tokens: int):
+        import openai
+
+        retryable = (
+            openai.RateLimitError,
+            openai.APITimeoutError,
+            openai.APIConnectionError,
+            openai.InternalServerError,
+        )
+        kwargs = {"model": self.model, "input": texts}
+        if self.dimensions:
+            kwargs["dimensions"] = self.dimensions
+
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire(tokens)
+            try:
+                response = await client.embeddings.create(**kwargs)
+            except retryable as e:
+                if attempt == self.max_retries:
+                    raise
+                self.stats.retries += 1
+                await asyncio.sleep(self._retry_delay(e, attempt))
+                continue
+
+            self.stats.requests += 1
+            self.stats.tokens += tokens
+            return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+    async def embed_async(
+        self,
+        texts: List[str],
+        on_batch: Optional[Callable[[List[int], List[List[float]]], None]] = None,
+    ) -> List[List[float]]:
+        """Embeds texts; see embed()."""
+        from openai import AsyncOpenAI
+
+        started = time.perf_counter()
+        token_counts = [self.count_tokens(text) for text in texts]
+        batches = pack_batches(token_counts, self.max_batch_tokens, self.max_batch_size)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+
+        # Retries are handled here, not by the client
+        async with AsyncOpenAI(
+            base_url=self.base_url, max_retries=0, timeout=self.timeout
+        ) as client:
+
+            async def run(indexes: List[int]) -> None:
+                async with semaphore:
+                    batch_vectors = await self._embed_batch(
+                        client,
+                        self.limiter,
+                        [texts[i] for i in indexes],
+                        sum(token_counts[i] for i in indexes),
+                    )
+                for i, vector in zip(indexes, batch_vectors):
+                    vectors[i] = vector
+                if on_batch is not None:
+                    on_batch(indexes, batch_vectors)
+
+            await asyncio.gather(*(run(indexes) for indexes in batches))
+
+        self.stats.seconds += time.perf_counter() - started
+        return vectors
+
+    def embed(
+        self,
+        texts: List[str],
+        on_batch: Optional[Callable[[List[int], List[List[float]]], None]] = None,
+    ) -> List[List[float]]:
+        """Embeds texts, calling ``on_batch(indexes, vectors)`` as each batch completes.
+
+        Args:
+            texts: Texts to embed
+            on_batch: Callback with the indexes of the batch texts and their vectors
+
+        Returns:
+            One vector per text, in order
+        """
+        return asyncio.run(self.embed_async(texts, on_batch))
+
+
+def embed_with_cache(
+    scheduler,
+    cache,
+    dims: int,
+    texts: List[str],
+    on_batch: Callable[[List[int], List[List[float]]], None],
+) -> None:
+    """Embeds texts through an EmbeddingCache, sending only misses to the API.
+
+    ``on_batch`` is called once for all cache hits, then for every embedded
+    batch; new vectors are stored in the cache before the callback runs.
+
+    Args:
+        scheduler: EmbeddingScheduler (or utils.embeddings.FunctionEmbedder) for the misses
+        cache: utils.embedding_cache.EmbeddingCache
+        dims: Vector size, part of the cache key
+        texts: Texts to embed
+        on_batch: Callback with text indexes and their vectors
+    """
+    from utils.embedding_cache import text_hash
+
+    hashes = [text_hash(text) for text in texts]
+    cached = cache.get_many(scheduler.model, dims, hashes)
+
+    hits = [i for i, key in enumerate(hashes) if key in cached]
+    if hits:
+        on_batch(hits, [cached[hashes[i]] for i in hits])
+
+    misses = [i for i, key in enumerate(hashes) if key not in cached]
+    if not misses:
+        return
+
+    def store(indexes: List[int], vectors: List[List[float]]) -> None:
+        original = [misses[i] for i in indexes]
+        cache.put_many(
+            scheduler.model, dims, {hashes[i]: vector for i, vector in zip(original, vectors)}
+        )
+        on_batch(original, vectors)
+
+    scheduler.embed([texts[i] for i in misses], on_batch=store)
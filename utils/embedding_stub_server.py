@@ -0,0 +1,103 @@
+import argparse
+import hashlib
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+def stub_vector(text: str, dims: int) -> list:
+    """Deterministic unit vector derived from the text hash."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dims)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible POST /v1/embeddings that can fail and lag on purpose."""
+
+    dims: int = 1536
+    error_rate: float = 0.0
+    latency: float = 0.0
+
+    def _send_json(self, status: int, payload, headers=None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if self.path.rstrip("/") not in ("/v1/embeddings", "/embeddings"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length))
+        if random.random() < self.error_rate:
+            self._send_json(
+                429, {"error": {"message": "Rate limit reached"}}, {"Retry-After": "0.1"}
+            )
+            return
+
+        time.sleep(self.latency)
+        texts = request["input"]
+        texts = [texts] if isinstance(texts, str) else texts
+        dims = request.get("dimensions") or self.dims
+        self._send_json(
+            200,
+            {
+                "object": "list",
+                "model": request.get("model", "stub"),
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": stub_vector(text, dims)}
+                    for i, text in enumerate(texts)
+                ],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            },
+        )
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(
+    host: str = "127.0.0.1",
+    port: int = 8766,
+    dims: int = 1536,
+    error_rate: float = 0.0,
+    latency: float = 0.0,
+) -> ThreadingHTTPServer:
+    """Creates a stub embedding server; call serve_forever() on the result."""
+    handler = type(
+        "StubHandler",
+        (_StubHandler,),
+        {"dims": dims, "error_rate": error_rate, "latency": latency},
+    )
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальная заглушка API эмбеддингов OpenAI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--dims", type=int, default=1536, help="Размерность векторов")
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Доля запросов, отвечающих 429"
+    )
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа, с")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.dims, args.error_rate, args.latency)
+    print(f"✅ Заглушка эмбеддингов: OPENAI_BASE_URL=http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
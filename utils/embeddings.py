@@ -0,0 +1,227 @@
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, List, Optional, Union
+
+import numpy as np
+from lancedb.embeddings import TextEmbeddingFunction, get_registry
+from lancedb.embeddings.registry import register
+
+from utils.embedding_scheduler import EmbeddingScheduler, SchedulerStats
+
+PROVIDERS = ("openai", "onnx", "hashing")
+DEFAULT_PROVIDER = "openai"
+DEFAULT_OPENAI_MODEL = "text-embedding-3-small"
+DEFAULT_ONNX_MODEL = "Xenova/multilingual-e5-small"
+
+_WORD = re.compile(r"\w+")
+
+
+@register("hashing")
+class HashingEmbeddings(TextEmbeddingFunction):
+    """Deterministic feature-hashing embeddings for tests and offline runs.
+
+    Words and character trigrams are hashed into a signed, L2-normalized
+    vector. Texts sharing many words end up close, which is enough to
+    exercise search end to end, but there is no semantic understanding.
+    """
+
+    name: str = "hashing"
+    dims: int = 384
+
+    def ndims(self) -> int:
+        return self.dims
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dims, dtype=np.float32)
+        words = _WORD.findall(text.lower())
+        features = words + [
+            word[i : i + 3] for word in words if len(word) > 3 for i in range(len(word) - 2)
+        ]
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dims] += 1.0 if value >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def generate_embeddings(self, texts: Union[List[str], np.ndarray]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+
+@lru_cache(maxsize=4)
+def _load_onnx(name: str, cache_dir: str, threads: int):
+    """Loads the ONNX session and tokenizer once per process."""
+    import onnxruntime
+    from huggingface_hub import snapshot_download
+    from tokenizers import Tokenizer
+
+    patterns = ["onnx/model_quantized.onnx", "tokenizer.json", "config.json"]
+    try:
+        # Works offline when the model is already in models_cache/
+        path = snapshot_download(
+            name, cache_dir=cache_dir, allow_patterns=patterns, local_files_only=True
+        )
+    except Exception:
+        path = snapshot_download(name, cache_dir=cache_dir, allow_patterns=patterns)
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = threads
+    session = onnxruntime.InferenceSession(
+        os.path.join(path, "onnx", "model_quantized.onnx"),
+        sess_options=options,
+        providers=["CPUExecutionProvider"],
+    )
+    tokenizer = Tokenizer.from_file(os.path.join(path, "tokenizer.json"))
+    tokenizer.enable_truncation(max_length=512)
+    tokenizer.enable_padding()
+    return session, tokenizer
+
+
+@register("onnx")
+class OnnxEmbeddings(TextEmbeddingFunction):
+    """CPU-local sentence encoder: a quantized ONNX model from models_cache/.
+
+    The default model, multilingual-e5-small, handles Russian and expects
+    "query: " / "passage: " prefixes, which are added automatically. Texts
+    are encoded in batches on a thread pool; onnxruntime releases the GIL.
+    """
+
+    name: str = DEFAULT_ONNX_MODEL
+    cache_dir: str = "models_cache/hub"
+    batch_size: int = 32
+    workers: int = 2
+    threads_per_worker: int = 2
+    query_prefix: str = "query: "
+    passage_prefix: str = "passage: "
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._ndims = None
+
+    def ndims(self) -> int:
+        if self._ndims is None:
+            self._ndims = len(self._encode(["probe"])[0])
+        return self._ndims
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        session, tokenizer = _load_onnx(self.name, self.cache_dir, self.threads_per_worker)
+        encodings = tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in {i.name for i in session.get_inputs()}:
+            inputs["token_type_ids"] = np.zeros_like(ids)
+
+        hidden = session.run(None, inputs)[0]
+        # Mean pooling over real tokens, then L2 normalization
+        weights = mask[..., None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        return pooled / np.linalg.norm(pooled, axis=1, keepdims=True)
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        batches = [texts[i : i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1:
+            results = [self._encode_batch(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                results = list(pool.map(self._encode_batch, batches))
+        return [vector.tolist() for result in results for vector in result]
+
+    def compute_query_embeddings(self, query: str, *args, **kwargs) -> List[List[float]]:
+        return self._encode([self.query_prefix + query])
+
+    def generate_embeddings(self, texts: Union[List[str], np.ndarray]) -> List[List[float]]:
+        return self._encode([self.passage_prefix + text for text in texts])
+
+
+@lru_cache(maxsize=None)
+def get_embedding_function(provider: Optional[str] = None):
+    """Creates the configured embedding function, once per process.
+
+    The provider comes from the argument or the EMBEDDING_PROVIDER variable:
+    "openai" (API, EMBEDDING_MODEL defaults to text-embedding-3-small),
+    "onnx" (local quantized encoder, EMBEDDING_MODEL defaults to
+    multilingual-e5-small) or "hashing" (deterministic). EMBEDDING_DIMS
+    requests shortened vectors from text-embedding-3 models and sets the
+    size of hashing vectors.
+
+    Raises:
+        ValueError: If the provider is unknown
+    """
+    provider = (provider or os.getenv("EMBEDDING_PROVIDER") or DEFAULT_PROVIDER).lower()
+    model = os.getenv("EMBEDDING_MODEL")
+    dims = os.getenv("EMBEDDING_DIMS")
+
+    if provider == "openai":
+        return get_registry().get("openai").create(
+            name=model or DEFAULT_OPENAI_MODEL, dim=int(dims) if dims else None
+        )
+    if provider == "onnx":
+        return get_registry().get("onnx").create(name=model or DEFAULT_ONNX_MODEL)
+    if provider == "hashing":
+        return get_registry().get("hashing").create(dims=int(dims or 384))
+    raise ValueError(f"Unknown embedding provider: {provider} (expected one of {PROVIDERS})")
+
+
+def embed_queries(func, queries: List[str]) -> List[List[float]]:
+    """Query vectors for several queries in one batch.
+
+    LanceDB embeds a text query with its own call; here OpenAI gets a single
+    request for all queries and the ONNX encoder a single forward pass (with
+    the "query: " prefix its queries need).
+    """
+    if not queries:
+        return []
+    if isinstance(func, OnnxEmbeddings):
+        vectors = func._encode([func.query_prefix + query for query in queries])
+    else:
+        vectors = func.compute_source_embeddings(list(queries))
+    return [list(map(float, vector)) for vector in vectors]
+
+
+class FunctionEmbedder:
+    """Runs a local LanceDB embedding function with the EmbeddingScheduler interface."""
+
+    def __init__(self, func, batch_size: int = 256):
+        self.func = func
+        self.model = func.name
+        self.batch_size = batch_size
+        self.stats = SchedulerStats()
+
+    def embed(
+        self,
+        texts: List[str],
+        on_batch: Optional[Callable[[List[int], List[List[float]]], None]] = None,
+    ) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            indexes = list(range(start, min(start + self.batch_size, len(texts))))
+            batch = self.func.compute_source_embeddings([texts[i] for i in indexes])
+            batch = [list(map(float, vector)) for vector in batch]
+            vectors.extend(batch)
+            self.stats.requests += 1
+            if on_batch is not None:
+                on_batch(indexes, batch)
+        return vectors
+
+
+def make_embedder(func, count_tokens: Callable[[str], int], **scheduler_options):
+    """Chooses how ingestion computes vectors for an embedding function.
+
+    OpenAI-compatible functions go through the rate-limited EmbeddingScheduler,
+    local ones are called directly in batches.
+    """
+    from lancedb.embeddings.openai import OpenAIEmbeddings
+
+    if isinstance(func, OpenAIEmbeddings):
+        return EmbeddingScheduler(
+            count_tokens,
+            model=func.name,
+            dimensions=func.dim,
+            base_url=func.base_url,
+            **scheduler_options,
+        )
+    return FunctionEmbedder(func)
@@ -0,0 +1,21 @@
+import os
+import pathlib
+
+
+# Настройка локального кэша для HuggingFace моделей
+def setup_local_cache(cache_dir: str = "models_cache") -> pathlib.Path:
+    """
+    Настраивает локальное кэширование HuggingFace моделей.
+    Создает необходимые папки и устанавливает переменные окружения.
+    Должна вызываться до импорта docling.
+    """
+    cache_path = pathlib.Path(cache_dir).absolute()
+    cache_path.mkdir(exist_ok=True)
+
+    # Настройка переменных окружения для HuggingFace
+    os.environ["HF_HOME"] = str(cache_path)
+    os.environ["HUGGINGFACE_HUB_CACHE"] = str(cache_path / "hub")
+    os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
+
+    print(f"🔧 Настроен локальный кэш HuggingFace: {cache_path}")
+    return cache_path
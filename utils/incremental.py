@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.chunks import ChunkRecord
+
+NO_HEADING = "(no heading)"
+
+
+def section_key(headings: List[str]) -> str:
+    """Identifies a section by its heading path, e.g. "Этап 1 > Квалификация"."""
+    return " > ".join(headings) if headings else NO_HEADING
+
+
+def _item_text(item, document) -> str:
+    text = getattr(item, "text", None)
+    if text is not None:
+        return text
+    if hasattr(item, "export_to_markdown"):
+        return item.export_to_markdown(doc=document)
+    return ""
+
+
+def section_fingerprints(document) -> Dict[str, str]:
+    """Hashes the content of every heading section of a DoclingDocument.
+
+    Sections are keyed by their heading path, tracked the same way
+    HybridChunker fills ``chunk.meta.headings``, so chunks can be mapped
+    back to the section they came from.
+
+    Args:
+        document: DoclingDocument
+
+    Returns:
+        Mapping of section key to sha256 of the section content
+    """
+    from docling_core.types.doc import SectionHeaderItem, TitleItem
+
+    heading_by_level: Dict[int, str] = {}
+    hashers: Dict[str, "hashlib._Hash"] = {}
+
+    for item, _ in document.iterate_items():
+        if isinstance(item, (SectionHeaderItem, TitleItem)):
+            level = item.level if isinstance(item, SectionHeaderItem) else 0
+            heading_by_level = {k: v for k, v in heading_by_level.items() if k < level}
+            heading_by_level[level] = item.text
+            continue
+
+        key = section_key([heading_by_level[k] for k in sorted(heading_by_level)])
+        hasher = hashers.setdefault(key, hashlib.sha256())
+        hasher.update(str(item.label).encode("utf-8") + b"\0")
+        hasher.update(_item_text(item, document).encode("utf-8") + b"\0")
+
+    return {key: hasher.hexdigest() for key, hasher in hashers.items()}
+
+
+@dataclass
+class ChunkDelta:
+    """Difference between the previous and the current chunking of a document."""
+
+    doc_id: str
+    added: List[ChunkRecord] = field(default_factory=list)
+    changed: List[ChunkRecord] = field(default_factory=list)
+    # Content hashes of chunks that disappeared or were replaced by a changed chunk
+    removed_hashes: List[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added or self.changed or self.removed_hashes)
+
+
+def _stable_keys(records: List[ChunkRecord]) -> List[str]:
+    """Keys chunks by section and ordinal within the section.
+
+    Editing one section shifts the global chunk index of everything after it,
+    but leaves the keys of chunks in other sections untouched.
+    """
+    ordinals: Dict[str, int] = {}
+    keys = []
+    for record in records:
+        section = section_key(record.headings)
+        ordinal = ordinals.get(section, 0)
+        ordinals[section] = ordinal + 1
+        keys.append(f"{section}#{ordinal}")
+    return keys
+
+
+def diff_document(
+    doc_id: str,
+    document,
+    chunk_fn: Callable[[object], List[ChunkRecord]],
+    previous: Optional[Dict] = None,
+) -> Tuple[ChunkDelta, Dict]:
+    """Chunks a document and compares the result with the previous manifest entry.
+
+    When no section fingerprint changed, the document is not chunked at all.
+    Otherwise the whole document is chunked again (HybridChunker has no way
+    to chunk a single section), and the delta holds only the chunks whose
+    section and ordinal key got a new content hash, so unchanged sections
+    cost no embedding or table writes.
+
+    Args:
+        doc_id: Document id used in the manifest
+        document: DoclingDocument
+        chunk_fn: Function that chunks the document into ChunkRecords
+        previous: Manifest entry of the previous run (None for a new document)
+
+    Returns:
+        The delta and the new manifest entry for the document
+    """
+    fingerprints = section_fingerprints(document)
+    previous = previous or {"sections": {}, "chunks": {}}
+
+    if previous["sections"] == fingerprints and previous["chunks"]:
+        delta = ChunkDelta(doc_id=doc_id, unchanged=len(previous["chunks"]))
+        return delta, previous
+
+    records = chunk_fn(document)
+    chunks = {}
+    delta = ChunkDelta(doc_id=doc_id)
+    for key, record in zip(_stable_keys(records), records):
+        content_hash = record.content_hash
+        chunks[key] = content_hash
+        old_hash = previous["chunks"].get(key)
+        if old_hash is None:
+            delta.added.append(record)
+        elif old_hash != content_hash:
+            delta.changed.append(record)
+            delta.removed_hashes.append(old_hash)
+        else:
+            delta.unchanged += 1
+
+    delta.removed_hashes.extend(
+        old_hash for key, old_hash in previous["chunks"].items() if key not in chunks
+    )
+    return delta, {"sections": fingerprints, "chunks": chunks}
+
+
+class ChunkManifest:
+    """JSON manifest with section fingerprints and chunk hashes of every document."""
+
+    def __init__(self, path: str = "chunks_manifest.json"):
+        self.path = path
+        self.documents: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.documents = json.load(f)
+
+    def get(self, doc_id: str) -> Optional[Dict]:
+        return self.documents.get(doc_id)
+
+    def update(self, doc_id: str, entry: Dict) -> None:
+        self.documents[doc_id] = entry
+
+    def remove_missing(self, doc_ids: List[str]) -> Dict[str, List[str]]:
+        """Drops documents that are no longer in the corpus.
+
+        Returns:
+            Mapping of removed doc_id to the content hashes of its chunks
+        """
+        current = set(doc_ids)
+        removed = {}
+        for doc_id in list(self.documents):
+            if doc_id not in current:
+                removed[doc_id] = list(self.documents.pop(doc_id)["chunks"].values())
+        return removed
+
+    def save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.documents, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
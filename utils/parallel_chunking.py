@@ -0,0 +1,176 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils.chunks import ChunkRecord
+from utils.incremental import ChunkDelta, ChunkManifest, diff_document
+
+# HybridChunker and DocumentConverter of the current worker process, created once in _init_worker
+_chunker = None
+_converter = None
+
+
+def _init_worker(max_tokens: int) -> None:
+    """Creates a HybridChunker with its own tokenizer and a converter in every worker process.
+
+    The converter loads its layout, OCR and table models on the first
+    conversion and keeps them for every later document of the worker.
+    """
+    global _chunker, _converter
+
+    from docling.chunking import HybridChunker
+
+    from utils.profiles import DEFAULT_PROFILE, get_converter
+    from utils.tokenizer import OpenAITokenizerWrapper
+
+    tokenizer = OpenAITokenizerWrapper(max_length=max_tokens)
+    _chunker = HybridChunker(tokenizer=tokenizer.chunker_tokenizer())
+    _converter = get_converter(DEFAULT_PROFILE)
+
+
+def load_document(source: str, converter=None):
+    """Loads a DoclingDocument from its JSON export or converts the source.
+
+    Args:
+        source: DoclingDocument JSON file or document to convert
+        converter: DocumentConverter to reuse when no conversion server runs
+    """
+    if source.lower().endswith(".json"):
+        from docling_core.types.doc import DoclingDocument
+
+        return DoclingDocument.load_from_json(source)
+
+    from utils.conversion_server import convert_document
+
+    return convert_document(source, converter)
+
+
+def _chunk(source: str, document) -> List[ChunkRecord]:
+    return [
+        ChunkRecord.from_doc_chunk(source, index, chunk)
+        for index, chunk in enumerate(_chunker.chunk(dl_doc=document))
+    ]
+
+
+def _chunk_one(source: str) -> List[ChunkRecord]:
+    return _chunk(source, load_document(source, _converter))
+
+
+def _diff_one(source: str, previous: Optional[Dict]) -> Tuple[ChunkDelta, Dict]:
+    document = load_document(source, _converter)
+    return diff_document(
+        source, document, lambda doc: _chunk(source, doc), previous
+    )
+
+
+def _ordered_map(
+    fn: Callable,
+    jobs: Iterable[tuple],
+    max_tokens: int,
+    workers: int,
+    max_in_flight: Optional[int],
+    on_error: Optional[Callable[[str, Exception], None]] = None,
+) -> Iterator:
+    """Runs fn(*job) on the chunking pool and yields results in job order.
+
+    At most ``max_in_flight`` jobs are submitted or buffered at any time. A
+    job that raises is skipped and reported to ``on_error`` with its source
+    (the first job argument), so one broken document does not stop the run;
+    without ``on_error`` the exception is re-raised.
+    """
+    max_in_flight = max(1, max_in_flight or 2 * workers)
+    remaining = iter(jobs)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(max_tokens,),
+    ) as pool:
+        in_flight = deque()
+        for job in remaining:
+            in_flight.append((job[0], pool.submit(fn, *job)))
+            if len(in_flight) >= max_in_flight:
+                break
+
+        while in_flight:
+            # Waiting on the oldest job keeps the output order deterministic
+            source, future = in_flight.popleft()
+            next_job = next(remaining, None)
+            if next_job is not None:
+                in_flight.append((next_job[0], pool.submit(fn, *next_job)))
+            try:
+                result = future.result()
+            except Exception as e:
+                if on_error is None:
+                    raise
+                on_error(source, e)
+                continue
+            yield result
+
+
+def _pool_size(workers: Optional[int], jobs: int) -> int:
+    return max(1, min(workers or os.cpu_count() or 1, jobs or 1))
+
+
+def chunk_documents(
+    sources: List[str],
+    max_tokens: int = 1024,
+    workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    on_error: Optional[Callable[[str, Exception], None]] = None,
+) -> Iterator[ChunkRecord]:
+    """Chunks many documents on a process pool and streams the chunks back in order.
+
+    Chunks are yielded document by document in the order of ``sources`` and
+    in chunk order within a document, regardless of which worker finishes
+    first. At most ``max_in_flight`` documents are submitted or buffered at
+    any time, which bounds memory on large corpora.
+
+    Args:
+        sources: DoclingDocument JSON files or documents to convert
+        max_tokens: Maximum number of tokens per chunk
+        workers: Number of worker processes (default: number of CPU cores)
+        max_in_flight: Maximum number of documents in progress (default: 2 * workers)
+        on_error: Called with the source and the exception of a document that
+            failed to load or chunk; the document is skipped. Without it the
+            first failure is raised
+
+    Yields:
+        ChunkRecord with document id and chunk index
+    """
+    jobs = ((source,) for source in sources)
+    workers = _pool_size(workers, len(sources))
+    for records in _ordered_map(
+        _chunk_one, jobs, max_tokens, workers, max_in_flight, on_error
+    ):
+        yield from records
+
+
+def chunk_deltas(
+    sources: List[str],
+    manifest: ChunkManifest,
+    max_tokens: int = 1024,
+    workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    on_error: Optional[Callable[[str, Exception], None]] = None,
+) -> Iterator[ChunkDelta]:
+    """Like chunk_documents, but yields only what changed since the manifest was saved.
+
+    Documents whose sections are unchanged are not chunked at all. The
+    manifest is updated in memory; call ``manifest.save()`` afterwards. A
+    failed document keeps its previous manifest entry and is retried on the
+    next run.
+
+    Yields:
+        ChunkDelta per document, in the order of ``sources``
+    """
+    jobs = ((source, manifest.get(source)) for source in sources)
+    workers = _pool_size(workers, len(sources))
+    for delta, entry in _ordered_map(
+        _diff_one, jobs, max_tokens, workers, max_in_flight, on_error
+    ):
+        manifest.update(delta.doc_id, entry)
+        yield delta
@@ -0,0 +1,175 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional
+
+# Marks the end of a stage's input
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """One step of a Pipeline.
+
+    ``fn`` receives one item and returns an iterable of items for the next
+    stage (empty to drop the item, several to fan out). If ``on_error`` is
+    set, an item whose ``fn`` raises is passed to it with the exception and
+    dropped; otherwise the exception stops the pipeline.
+    """
+
+    name: str
+    fn: Callable[[object], Iterable]
+    workers: int = 1
+    queue_size: int = 4
+    on_error: Optional[Callable[[object, Exception], None]] = None
+
+
+@dataclass
+class StageStats:
+    name: str
+    items_in: int = 0
+    items_out: int = 0
+    busy_seconds: float = 0.0
+    # Time spent blocked on a full output queue: the next stage is the bottleneck
+    blocked_seconds: float = 0.0
+
+
+class _Failed(Exception):
+    pass
+
+
+class Pipeline:
+    """Runs stages on worker threads connected by bounded queues.
+
+    Every stage has its own worker count and an input queue of at most
+    ``queue_size`` items, so a slow stage applies back-pressure upstream and
+    memory stays bounded regardless of the number of inputs. Network-bound
+    stages (embedding API, conversion server) overlap with CPU-bound ones
+    because native code in docling, tiktoken and LanceDB releases the GIL.
+    The first exception in a stage without ``on_error`` stops the pipeline
+    and is re-raised.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        if not stages:
+            raise ValueError("Pipeline needs at least one stage")
+        self.stages = stages
+        self.stats = [StageStats(stage.name) for stage in stages]
+        self._queues = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+        self._output: queue.Queue = queue.Queue(maxsize=stages[-1].queue_size)
+        self._error: Optional[BaseException] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def _put(self, q: queue.Queue, item) -> None:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise _Failed()
+
+    def _get(self, q: queue.Queue):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        raise _Failed()
+
+    def _fail(self, error: BaseException) -> None:
+        with self._lock:
+            if self._error is None:
+                self._error = error
+        self._stop.set()
+
+    def _worker(self, index: int, remaining: List[int]) -> None:
+        stage, stats = self.stages[index], self.stats[index]
+        inbox = self._queues[index]
+        outbox = self._queues[index + 1] if index + 1 < len(self.stages) else self._output
+        try:
+            while True:
+                item = self._get(inbox)
+                if item is _DONE:
+                    # Let sibling workers see the marker too
+                    self._put(inbox, _DONE)
+                    break
+
+                started = time.perf_counter()
+                try:
+                    outputs = list(stage.fn(item))
+                except Exception as e:
+                    if stage.on_error is None:
+                        raise
+                    stage.on_error(item, e)
+                    outputs = []
+                with self._lock:
+                    stats.items_in += 1
+                    stats.items_out += len(outputs)
+                    stats.busy_seconds += time.perf_counter() - started
+
+                for output in outputs:
+                    blocked = time.perf_counter()
+                    self._put(outbox, output)
+                    with self._lock:
+                        stats.blocked_seconds += time.perf_counter() - blocked
+
+            with self._lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last:
+                self._put(outbox, _DONE)
+        except _Failed:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    def _feed(self, items: Iterable) -> None:
+        try:
+            for item in items:
+                self._put(self._queues[0], item)
+            self._put(self._queues[0], _DONE)
+        except _Failed:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    def run(self, items: Iterable) -> Iterator:
+        """Feeds items through all stages and yields the outputs of the last one.
+
+        Outputs come in completion order. Iterate the result to completion;
+        stopping early cancels the remaining work.
+        """
+        remaining = [stage.workers for stage in self.stages]
+        threads = [threading.Thread(target=self._feed, args=(items,), daemon=True)]
+        for index, stage in enumerate(self.stages):
+            threads.extend(
+                threading.Thread(
+                    target=self._worker,
+                    args=(index, remaining),
+                    name=f"{stage.name}-{n}",
+                    daemon=True,
+                )
+                for n in range(stage.workers)
+            )
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                try:
+                    item = self._get(self._output)
+                except _Failed:
+                    break
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,178 @@
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+PROFILES = ("fast", "balanced", "accurate")
+# Docling defaults (OCR, accurate tables): what a bare DocumentConverter() does
+DEFAULT_PROFILE = "accurate"
+
+# Converters are expensive to build, keep one per profile
+_converters = {}
+
+
+@dataclass
+class ConversionReport:
+    """What a conversion cost and which profile it used."""
+
+    profile: str
+    pages: int
+    text_layer_pages: int
+    seconds: float
+    cached: bool = False
+    # Seconds per page spent in every pipeline stage (layout, ocr, table_structure, ...)
+    page_timings: Dict[str, float] = field(default_factory=dict)
+
+
+def pipeline_options(profile: str):
+    """Builds PdfPipelineOptions for a conversion profile.
+
+    Args:
+        profile: "fast" (no OCR, no tables), "balanced" (no OCR, fast table
+            model) or "accurate" (docling defaults: OCR and accurate tables)
+
+    Returns:
+        PdfPipelineOptions for the profile
+    """
+    from docling.datamodel.pipeline_options import PdfPipelineOptions, TableFormerMode
+
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile '{profile}', expected one of {PROFILES}")
+
+    options = PdfPipelineOptions()
+    if profile == "fast":
+        options.do_ocr = False
+        options.do_table_structure = False
+    elif profile == "balanced":
+        options.do_ocr = False
+        options.table_structure_options.mode = TableFormerMode.FAST
+    else:
+        options.table_structure_options.mode = TableFormerMode.ACCURATE
+    return options
+
+
+def make_converter(profile: str):
+    """Builds a new DocumentConverter for the profile.
+
+    Docling loads the models into the converter on its first conversion and
+    keeps them there, so reuse the result; get_converter() shares one per process.
+    """
+    from docling.datamodel.base_models import InputFormat
+    from docling.document_converter import DocumentConverter, PdfFormatOption
+
+    return DocumentConverter(
+        format_options={
+            InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options(profile))
+        }
+    )
+
+
+def get_converter(profile: str):
+    """Returns a DocumentConverter for the profile, building it once per process."""
+    if profile not in _converters:
+        _converters[profile] = make_converter(profile)
+    return _converters[profile]
+
+
+def text_layer_pages(pdf_path: str, min_chars: int = 20) -> List[bool]:
+    """Detects which pages of a PDF already have a usable text layer.
+
+    Args:
+        pdf_path: Path to the PDF file
+        min_chars: Minimum number of characters for a page to count as born-digital
+
+    Returns:
+        One flag per page, True if the page has a text layer
+    """
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(pdf_path)
+    try:
+        flags = []
+        for page in pdf:
+            textpage = page.get_textpage()
+            flags.append(textpage.count_chars() >= min_chars)
+            textpage.close()
+            page.close()
+        return flags
+    finally:
+        pdf.close()
+
+
+def choose_profile(pdf_path: str) -> Tuple[str, List[bool]]:
+    """Picks the cheapest profile that does not lose content.
+
+    Born-digital PDFs (a text layer on every page) do not need OCR and are
+    converted with "balanced"; anything with scanned pages uses "accurate".
+
+    Returns:
+        Chosen profile and the per-page text layer flags
+    """
+    flags = text_layer_pages(pdf_path)
+    if flags and all(flags):
+        return "balanced", flags
+    return "accurate", flags
+
+
+def _page_timings(conv_result, pages: int) -> Dict[str, float]:
+    from docling.utils.profiling import ProfilingScope
+
+    timings = {}
+    for name, item in conv_result.timings.items():
+        if item.scope == ProfilingScope.PAGE and pages:
+            timings[name] = sum(item.times) / pages
+    return timings
+
+
+def convert_with_profile(
+    source: str, profile: str = "auto", cache=None
+) -> Tuple[object, ConversionReport]:
+    """Converts a document with a conversion profile and reports the per-page cost.
+
+    Args:
+        source: Path to the source document
+        profile: One of PROFILES, or "auto" to choose from the PDF text layer
+        cache: Optional ConversionCache; a hit skips conversion entirely
+
+    Returns:
+        The DoclingDocument and a ConversionReport
+    """
+    from docling.datamodel.settings import settings
+
+    from utils.conversion_cache import options_fingerprint
+
+    flags: List[bool] = []
+    if source.lower().endswith(".pdf"):
+        if profile == "auto":
+            profile, flags = choose_profile(source)
+        else:
+            flags = text_layer_pages(source)
+    elif profile == "auto":
+        profile = "accurate"
+
+    converter = get_converter(profile)
+    started = time.perf_counter()
+    report = ConversionReport(
+        profile=profile, pages=len(flags), text_layer_pages=sum(flags), seconds=0.0
+    )
+
+    key: Optional[str] = None
+    if cache is not None:
+        key = cache.key(source, options_fingerprint(converter))
+        document = cache.get(key)
+        if document is not None:
+            report.cached = True
+            report.seconds = time.perf_counter() - started
+            return document, report
+
+    settings.debug.profile_pipeline_timings = True
+    result = converter.convert(source)
+    if result.document is None:
+        raise ValueError(f"Document was not produced for {source}")
+
+    report.seconds = time.perf_counter() - started
+    report.pages = report.pages or len(result.pages)
+    report.page_timings = _page_timings(result, report.pages)
+
+    if cache is not None:
+        cache.put(key, result.document)
+    return result.document, report
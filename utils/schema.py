@@ -0,0 +1,126 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from lancedb.pydantic import LanceModel, Vector
+
+from utils.chunks import ChunkRecord
+from utils.incremental import section_key
+from utils.table_sync import stable_chunk_id
+from utils.vector_index import vector_dtype
+
+TABLE_NAME = "docling"
+
+
+def chunk_schema(func, dtype: str = None):
+    """Builds the LanceModel of the chunks table for an embedding function.
+
+    Vectors are stored as float32 or, to halve disk size and scan cost, as
+    float16 (``dtype`` or the VECTOR_DTYPE variable).
+    """
+    value_type = vector_dtype(dtype)
+
+    # Define a simplified metadata schema
+    class ChunkMetadata(LanceModel):
+        """
+        You must order the fields in alphabetical order.
+        This is a requirement of the Pydantic implementation.
+        """
+
+        filename: str
+        headings: List[str]  # полный путь заголовков
+        pages: List[int]
+        sources: List[str]  # chunk_id всех фрагментов, которые представляет эта запись
+        title: str
+
+    # Define the main Schema. Столбцы верхнего уровня служат для фильтров и скалярных индексов
+    class Chunks(LanceModel):
+        id: str  # stable_chunk_id(doc_id, content_hash)
+        doc_id: str
+        section: str  # "Заголовок > Подзаголовок"
+        chunk_index: int
+        content_hash: str
+        meta_hash: str  # metadata_hash(): the row is rewritten when it changes
+        page_start: int  # 0, если у формата нет страниц
+        page_end: int
+        ingested_at: datetime
+        text: str = func.SourceField()
+        vector: Vector(func.ndims(), value_type=value_type) = func.VectorField()  # type: ignore
+        metadata: ChunkMetadata
+
+    return Chunks
+
+
+def embedding_identity(schema) -> List[Tuple[str, Optional[str]]]:
+    """(provider, model name) of every embedding function recorded in a table schema.
+
+    LanceDB stores the embedding function configuration in the schema
+    metadata; two models with the same vector size differ only there.
+    """
+    raw = (schema.metadata or {}).get(b"embedding_functions")
+    if not raw:
+        return []
+    return [(entry.get("name"), entry.get("model", {}).get("name")) for entry in json.loads(raw)]
+
+
+def open_chunks_table(
+    db, func, rebuild: bool = False, name: str = TABLE_NAME, dtype: str = None
+):
+    """Opens the chunks table, recreating it on request or when its schema is outdated.
+
+    The schema is outdated when its columns differ from chunk_schema() (an
+    older layout, another number of dimensions or VECTOR_DTYPE) or when it
+    was filled by another embedding provider or model, even one with the
+    same vector size: TableSync would keep the old vectors next to new ones.
+    """
+    model = chunk_schema(func, dtype)
+    if not rebuild and name in db.table_names():
+        table = db.open_table(name)
+        expected = model.to_arrow_schema()
+        if table.schema.remove_metadata().equals(
+            expected.remove_metadata()
+        ) and embedding_identity(table.schema) == embedding_identity(expected):
+            return table
+    return db.create_table(name, schema=model, mode="overwrite")
+
+
+def _metadata_columns(record: ChunkRecord, sources: List[str] = None) -> dict:
+    return {
+        "section": section_key(record.headings),
+        "chunk_index": record.index,
+        "page_start": record.pages[0] if record.pages else 0,
+        "page_end": record.pages[-1] if record.pages else 0,
+        "metadata": {
+            "filename": record.filename,
+            "headings": record.headings,
+            "pages": record.pages,
+            "sources": sources or [record.chunk_id],
+            "title": record.title,
+        },
+    }
+
+
+def metadata_hash(record: ChunkRecord, sources: List[str] = None) -> str:
+    """Hash of everything a row stores about a chunk besides its text and vector.
+
+    The row id only follows the text, so a renamed heading, a shifted chunk
+    or a new duplicate set is detected by this hash instead.
+    """
+    columns = json.dumps(_metadata_columns(record, sources), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(columns.encode("utf-8")).hexdigest()
+
+
+def to_row(record: ChunkRecord, vector, sources: List[str] = None) -> dict:
+    """Table row of a chunk with its precomputed vector."""
+    content_hash = record.content_hash
+    return {
+        "id": stable_chunk_id(record.doc_id, content_hash),
+        "doc_id": record.doc_id,
+        "content_hash": content_hash,
+        "meta_hash": metadata_hash(record, sources),
+        "ingested_at": datetime.now(timezone.utc),
+        "text": record.text,
+        "vector": vector,
+        **_metadata_columns(record, sources),
+    }
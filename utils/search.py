@@ -0,0 +1,307 @@
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Union
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from utils.embeddings import embed_queries, get_embedding_function
+
+SEARCH_MODES = ("vector", "hybrid", "lexical")
+# Reciprocal rank fusion constant: damps the weight of the very first ranks
+RRF_K = 60
+# Each side of a hybrid search returns this many times more candidates than needed
+HYBRID_CANDIDATES = 3
+# Columns SearchResult is read from: everything but the vector
+RESULT_COLUMNS = ["id", "doc_id", "text", "section", "page_start", "page_end", "metadata"]
+# Score column of each search mode
+SCORE_COLUMNS = ("_distance", "_relevance_score", "_score")
+
+
+@dataclass
+class SearchResult:
+    """One retrieved chunk.
+
+    ``score`` is the vector distance (lower is closer), the RRF score of a
+    hybrid search or the BM25 score of a lexical one (higher is better).
+    """
+
+    chunk_id: str
+    doc_id: str
+    text: str
+    score: float
+    filename: str
+    title: str
+    section: str
+    headings: List[str] = field(default_factory=list)
+    page_start: int = 0
+    page_end: int = 0
+
+
+def to_results(rows: pa.Table) -> List[SearchResult]:
+    """Reads search results from Arrow column by column, without pandas.
+
+    Args:
+        rows: Result of retrieve() or search_chunks() selected with RESULT_COLUMNS
+    """
+    if rows.num_rows == 0:
+        return []
+    score_column = next(name for name in SCORE_COLUMNS if name in rows.column_names)
+    metadata = rows.column("metadata").combine_chunks()
+    columns = zip(
+        rows.column("id").to_pylist(),
+        rows.column("doc_id").to_pylist(),
+        rows.column("text").to_pylist(),
+        rows.column(score_column).to_pylist(),
+        metadata.field("filename").to_pylist(),
+        metadata.field("title").to_pylist(),
+        rows.column("section").to_pylist(),
+        metadata.field("headings").to_pylist(),
+        rows.column("page_start").to_pylist(),
+        rows.column("page_end").to_pylist(),
+    )
+    return [SearchResult(*values) for values in columns]
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _like_prefix(value: str) -> str:
+    """LIKE pattern matching strings that start with value literally (ESCAPE '\\')."""
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return _quote(escaped + "%")
+
+
+def build_filter(
+    doc_ids: Optional[Union[str, List[str]]] = None,
+    section: Optional[str] = None,
+    since: Optional[datetime] = None,
+    page: Optional[int] = None,
+) -> Optional[str]:
+    """Builds a SQL prefilter over the indexed columns of the chunks table.
+
+    Args:
+        doc_ids: Document id or ids to search in
+        section: Heading path; matches the section and its subsections
+        since: Only chunks ingested at or after this time (naive values are UTC)
+        page: Only chunks that span this page
+
+    Returns:
+        Filter expression, or None when no condition is given
+    """
+    conditions = []
+    if doc_ids:
+        doc_ids = [doc_ids] if isinstance(doc_ids, str) else doc_ids
+        conditions.append(f"doc_id IN ({', '.join(_quote(d) for d in doc_ids)})")
+    if section:
+        conditions.append(
+            f"(section = {_quote(section)} "
+            f"OR section LIKE {_like_prefix(section + ' > ')} ESCAPE '\\')"
+        )
+    if since is not None:
+        if since.tzinfo is not None:
+            since = since.astimezone(timezone.utc)
+        conditions.append(f"ingested_at >= timestamp '{since.strftime('%Y-%m-%d %H:%M:%S')}'")
+    if page is not None:
+        conditions.append(f"page_start <= {int(page)} AND page_end >= {int(page)}")
+    return " AND ".join(conditions) or None
+
+
+def search_chunks(
+    table,
+    query,
+    limit: int = 5,
+    where: Optional[str] = None,
+    columns=None,
+    nprobes: Optional[int] = None,
+    refine_factor: Optional[int] = None,
+    lexical: bool = False,
+):
+    """Vector (or full-text) search narrowed by a prefilter.
+
+    The filter is applied before the nearest-neighbour search, so only the
+    matching rows (found through the scalar indexes) are scored and the
+    result still has ``limit`` rows when enough of them match.
+
+    ``nprobes`` and ``refine_factor`` only matter once the table has a vector
+    index; they default to SEARCH_NPROBES and SEARCH_REFINE_FACTOR, which
+    4-3-index-management.py tune helps to choose. ``lexical`` searches the
+    BM25 full-text index instead and needs no query embedding.
+
+    Args:
+        table: LanceDB chunks table
+        query: Query text or vector
+        limit: Number of results
+        where: Filter from build_filter()
+        columns: Columns to return (default: all)
+        nprobes: IVF partitions to search (more is slower and more accurate)
+        refine_factor: Rescore limit * refine_factor candidates on the stored vectors
+        lexical: Full-text search of a text query (results have ``_score``, not ``_distance``)
+
+    Returns:
+        LanceDB query builder; call to_pandas() / to_arrow() / to_list()
+    """
+    if lexical:
+        search = table.search(query, query_type="fts").limit(limit)
+    else:
+        search = table.search(query).limit(limit)
+        nprobes = nprobes or _env_int("SEARCH_NPROBES")
+        refine_factor = refine_factor or _env_int("SEARCH_REFINE_FACTOR")
+        if nprobes:
+            search = search.nprobes(nprobes)
+        if refine_factor:
+            search = search.refine_factor(refine_factor)
+    if where:
+        search = search.where(where, prefilter=True)
+    if columns:
+        search = search.select(columns)
+    return search
+
+
+def search_batch(
+    table,
+    queries: List[str],
+    limit: int = 5,
+    where: Optional[str] = None,
+    columns=None,
+    func=None,
+    query_cache=None,
+    **options,
+) -> List[pa.Table]:
+    """Searches several queries at once.
+
+    All queries are embedded in one call and searched as one multi-vector
+    query, so N queries cost about one embedding round trip and one scan
+    instead of N of each.
+
+    Args:
+        table: LanceDB chunks table
+        queries: Query texts
+        limit: Number of results per query
+        where: Filter from build_filter(), shared by all queries
+        columns: Columns to return (default: all)
+        func: Embedding function of the table (default: get_embedding_function())
+        query_cache: QueryEmbeddingCache to take query vectors from (replaces func)
+        **options: nprobes / refine_factor, as in search_chunks()
+
+    Returns:
+        One Arrow table per query, nearest first; to_pylist() gives dicts
+    """
+    if not queries:
+        return []
+    if query_cache is not None:
+        vectors = query_cache.embed(queries)
+    else:
+        vectors = embed_queries(func or get_embedding_function(), queries)
+    results = search_chunks(table, vectors, limit, where, columns, **options).to_arrow()
+    if "query_index" not in results.column_names:
+        # LanceDB adds query_index only for multi-vector queries
+        return [results]
+
+    query_index = results.column("query_index")
+    results = results.drop_columns(["query_index"])
+    return [
+        results.filter(pc.equal(query_index, i)).sort_by("_distance")
+        for i in range(len(queries))
+    ]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> Dict[str, float]:
+    """Fuses ranked id lists: each list adds 1 / (k + rank) to the score of its ids."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+def hybrid_search(
+    table,
+    text: str,
+    vector,
+    limit: int = 5,
+    where: Optional[str] = None,
+    columns=None,
+    **options,
+) -> pa.Table:
+    """Fuses full-text and vector rankings with reciprocal rank fusion.
+
+    Both searches use the same prefilter. Exact terms (names, numbers,
+    abbreviations) are found by the BM25 side even when embeddings blur
+    them, paraphrases by the vector side.
+
+    Args:
+        table: LanceDB chunks table
+        text: Query text for the full-text side
+        vector: Query vector for the vector side
+        limit: Number of results
+        where: Filter from build_filter()
+        columns: Columns to return (default: all); ``id`` is always included
+        **options: nprobes / refine_factor, as in search_chunks()
+
+    Returns:
+        Arrow table with ``_relevance_score``, best first
+    """
+    if columns and "id" not in columns:
+        columns = ["id", *columns]
+    candidates = limit * HYBRID_CANDIDATES
+    by_vector = search_chunks(table, vector, candidates, where, columns, **options).to_arrow()
+    by_text = search_chunks(table, text, candidates, where, columns, lexical=True).to_arrow()
+
+    scores = reciprocal_rank_fusion(
+        [by_vector.column("id").to_pylist(), by_text.column("id").to_pylist()]
+    )
+    ranked = sorted(scores, key=scores.get, reverse=True)[:limit]
+
+    rows = pa.concat_tables(
+        [by_vector.drop_columns(["_distance"]), by_text.drop_columns(["_score"])],
+        promote_options="permissive",
+    )
+    first_row: Dict[str, int] = {}
+    for i, key in enumerate(rows.column("id").to_pylist()):
+        first_row.setdefault(key, i)
+    result = rows.take([first_row[key] for key in ranked])
+    return result.append_column(
+        "_relevance_score", pa.array([scores[key] for key in ranked], pa.float32())
+    )
+
+
+def retrieve(
+    table,
+    query: str,
+    mode: str = "hybrid",
+    limit: int = 5,
+    where: Optional[str] = None,
+    columns=None,
+    func=None,
+    query_cache=None,
+    **options,
+) -> pa.Table:
+    """Searches a text query in one of SEARCH_MODES.
+
+    "lexical" is the fast path: no embedding call, only the full-text index.
+    "vector" and "hybrid" embed the query once (through ``query_cache`` when
+    given).
+
+    Raises:
+        ValueError: If the mode is unknown
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode: {mode} (expected one of {SEARCH_MODES})")
+    if mode == "lexical":
+        return search_chunks(table, query, limit, where, columns, lexical=True).to_arrow()
+
+    if query_cache is not None:
+        vector = query_cache.embed_one(query)
+    else:
+        vector = embed_queries(func or get_embedding_function(), [query])[0]
+    if mode == "vector":
+        return search_chunks(table, vector, limit, where, columns, **options).to_arrow()
+    return hybrid_search(table, query, vector, limit, where, columns, **options)
@@ -1,16 +1,319 @@
+import gzip
+import json
+import os
+import threading
 import xml.etree.ElementTree as ET
-from typing import List
-from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
 
 
-def get_sitemap_urls(base_url: str, sitemap_filename: str = "sitemap.xml") -> List[str]:
+@dataclass
+class SitemapEntry:
+    """A <url> or <sitemap> entry of a sitemap."""
+
+    loc: str
+    lastmod: Optional[str] = None
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+class _PrefixedStream:
+    """Binary stream that replays already consumed leading bytes."""
+
+    def __init__(self, prefix: bytes, stream):
+        self._prefix = prefix
+        self._stream = stream
+
+    def read(self, size: int = -1) -> bytes:
+        if not self._prefix:
+            return self._stream.read(size)
+        if size is None or size < 0:
+            data, self._prefix = self._prefix + self._stream.read(), b""
+            return data
+        data, self._prefix = self._prefix[:size], self._prefix[size:]
+        if len(data) < size:
+            data += self._stream.read(size - len(data))
+        return data
+
+
+def iter_sitemap(stream) -> Iterator[Tuple[str, SitemapEntry]]:
+    """Stream-parses a (possibly gzipped) sitemap without loading it into memory.
+
+    Args:
+        stream: Binary file-like object with the sitemap XML or its gzip
+
+    Yields:
+        ("url", entry) for pages and ("sitemap", entry) for nested sitemaps
+    """
+    magic = stream.read(2)
+    source = _PrefixedStream(magic, stream)
+    if magic == b"\x1f\x8b":
+        source = gzip.GzipFile(fileobj=source)
+
+    context = ET.iterparse(source, events=("start", "end"))
+    _, root = next(context)
+    loc = lastmod = None
+
+    for event, elem in context:
+        if event != "end":
+            continue
+
+        name = _local_name(elem.tag)
+        if name == "loc":
+            loc = (elem.text or "").strip()
+        elif name == "lastmod":
+            lastmod = (elem.text or "").strip()
+        elif name in ("url", "sitemap"):
+            if loc:
+                yield name, SitemapEntry(loc=loc, lastmod=lastmod)
+            loc = lastmod = None
+            # Drop processed elements so memory stays flat on huge sitemaps
+            root.clear()
+
+
+class SitemapCrawler:
+    """Concurrent sitemap crawler with conditional requests.
+
+    Follows sitemap indexes, parses plain and gzipped sitemaps in streaming
+    mode and remembers ETag/Last-Modified/<lastmod> values in a JSON state
+    file, so that subsequent crawls return only the pages that changed.
+
+    New validators are only held in memory by a crawl. A page's validators
+    are saved by ``record_page`` once the caller has processed it, and
+    sitemap validators once every changed page is recorded, so a page whose
+    processing failed (or a run that died) is returned again next time.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 16,
+        per_host: int = 4,
+        timeout: float = 10,
+        state_path: Optional[str] = None,
+    ):
+        """Initialize the crawler.
+
+        Args:
+            max_workers: Total number of concurrent requests
+            per_host: Maximum number of concurrent requests to a single host
+            timeout: Request timeout in seconds
+            state_path: JSON file for change tracking between crawls (None disables it)
+        """
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.state_path = state_path
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._host_limits: Dict[str, threading.Semaphore] = {}
+        self._lock = threading.Lock()
+        self.state = self._load_state()
+        # Validators seen by the current crawl, not yet saved
+        self.pending_pages: Dict[str, Dict] = {}
+        self._pending_sitemaps: Dict[str, Dict] = {}
+
+    def _load_state(self) -> Dict[str, Dict]:
+        if self.state_path and os.path.exists(self.state_path):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {"sitemaps": {}, "pages": {}}
+
+    def save_state(self) -> None:
+        """Writes the change-tracking state to state_path."""
+        if not self.state_path:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+
+    def _host_limit(self, url: str) -> threading.Semaphore:
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.Semaphore(self.per_host)
+            return self._host_limits[host]
+
+    @staticmethod
+    def _conditional_headers(validators: Dict) -> Dict[str, str]:
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        return headers
+
+    @staticmethod
+    def _validators(response: requests.Response) -> Dict[str, str]:
+        return {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+
+    def _fetch_sitemap(self, url: str) -> Tuple[List[SitemapEntry], List[str]]:
+        """Fetches one sitemap; returns its pages and nested sitemap URLs.
+
+        An unchanged sitemap (304) still returns its pages without <lastmod>,
+        remembered in the state: only a HEAD request can tell if they changed.
+        """
+        known = self.state["sitemaps"].get(url, {})
+        # State written before pages without <lastmod> were listed: fetch in full once
+        conditional = self.state_path and "no_lastmod" in known
+        headers = self._conditional_headers(known) if conditional else {}
+
+        with self._host_limit(url):
+            response = self.session.get(
+                url, headers=headers, timeout=self.timeout, stream=True
+            )
+            try:
+                if response.status_code == 304:
+                    # Unchanged sitemap: pages with <lastmod> are unchanged too, but
+                    # pages without it and nested sitemaps are checked on their own
+                    pages = [SitemapEntry(loc=loc) for loc in known.get("no_lastmod", [])]
+                    return pages, known.get("children", [])
+
+                response.raise_for_status()
+                response.raw.decode_content = True
+
+                pages, children = [], []
+                for kind, entry in iter_sitemap(response.raw):
+                    if kind == "sitemap":
+                        children.append(urljoin(url, entry.loc))
+                    else:
+                        pages.append(entry)
+            finally:
+                response.close()
+
+        with self._lock:
+            self._pending_sitemaps[url] = {
+                **self._validators(response),
+                "children": children,
+                "no_lastmod": [entry.loc for entry in pages if not entry.lastmod],
+            }
+        return pages, children
+
+    def crawl(self, sitemap_url: str) -> List[SitemapEntry]:
+        """Collects the pages of a sitemap, following sitemap indexes concurrently.
+
+        Args:
+            sitemap_url: URL of the sitemap or sitemap index
+
+        Returns:
+            Page entries of all (changed) sitemaps, without duplicates
+        """
+        pages: Dict[str, SitemapEntry] = {}
+        seen = {sitemap_url}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = [pool.submit(self._fetch_sitemap, sitemap_url)]
+            while pending:
+                future = pending.pop(0)
+                found, children = future.result()
+                for entry in found:
+                    pages.setdefault(entry.loc, entry)
+                for child in children:
+                    if child not in seen:
+                        seen.add(child)
+                        pending.append(pool.submit(self._fetch_sitemap, child))
+
+        return list(pages.values())
+
+    def _page_changed(self, entry: SitemapEntry) -> Optional[Dict]:
+        """New validators of a changed page, or None if it is unchanged."""
+        known = self.state["pages"].get(entry.loc)
+
+        if entry.lastmod:
+            if known and known.get("lastmod") == entry.lastmod:
+                return None
+            return {"lastmod": entry.lastmod}
+
+        # No <lastmod>: ask the server with a conditional HEAD request
+        headers = self._conditional_headers(known or {})
+        with self._host_limit(entry.loc):
+            response = self.session.head(
+                entry.loc, headers=headers, timeout=self.timeout, allow_redirects=True
+            )
+        if response.status_code == 304:
+            return None
+        return self._validators(response)
+
+    def changed_pages(self, sitemap_url: str) -> Dict[str, Dict]:
+        """Returns pages that are new or changed since the previous crawl.
+
+        Nothing is saved: pass each URL to ``record_page`` once it is processed.
+        Without a state_path every page counts as changed.
+
+        Returns:
+            Mapping of page URL to its new validators
+        """
+        entries = self.crawl(sitemap_url)
+        if not self.state_path:
+            return {entry.loc: {} for entry in entries}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            validators = list(pool.map(self._page_changed, entries))
+
+        self.pending_pages = {
+            entry.loc: new for entry, new in zip(entries, validators) if new is not None
+        }
+        if not self.pending_pages:
+            self._commit_sitemaps()
+        return dict(self.pending_pages)
+
+    def changed_urls(self, sitemap_url: str) -> List[str]:
+        """Returns page URLs that are new or changed since the previous crawl."""
+        return list(self.changed_pages(sitemap_url))
+
+    def _commit_sitemaps(self) -> None:
+        self.state["sitemaps"].update(self._pending_sitemaps)
+        self._pending_sitemaps = {}
+        self.save_state()
+
+    def record_page(self, url: str) -> None:
+        """Saves the validators of a successfully processed page.
+
+        Once every changed page is recorded the sitemap validators are saved
+        too, so the next crawl can skip unchanged sitemaps with a 304.
+        """
+        with self._lock:
+            validators = self.pending_pages.pop(url, None)
+            if validators is None or not self.state_path:
+                return
+            self.state["pages"][url] = validators
+            if self.pending_pages:
+                self.save_state()
+            else:
+                self._commit_sitemaps()
+
+
+def get_sitemap_urls(
+    base_url: str,
+    sitemap_filename: str = "sitemap.xml",
+    state_path: Optional[str] = None,
+    crawler: Optional[SitemapCrawler] = None,
+) -> List[str]:
     """Fetches and parses a sitemap XML file to extract URLs.
 
+    Sitemap indexes are followed and gzipped sitemaps are supported.
+
     Args:
         base_url: The base URL of the website
         sitemap_filename: The filename of the sitemap (default: sitemap.xml)
+        state_path: Optional JSON file to remember what was seen; when given,
+            only URLs that changed since the previous call are returned
+        crawler: Crawler to use instead of a new one; call its record_page()
+            for every URL processed successfully, otherwise it stays "changed"
 
     Returns:
         List of URLs found in the sitemap. If sitemap is not found, returns a list
@@ -21,35 +324,18 @@ def get_sitemap_urls(base_url: str, sitemap_filename: str = "sitemap.xml") -> Li
     """
     try:
         sitemap_url = urljoin(base_url, sitemap_filename)
+        crawler = crawler or SitemapCrawler(state_path=state_path)
+        return crawler.changed_urls(sitemap_url)
 
-        # Fetch sitemap URL
-        response = requests.get(sitemap_url, timeout=10)
-
-        # # Return just the base URL if sitemap not found
-        if response.status_code == 404:
+    except requests.HTTPError as e:
+        # Return just the base URL if sitemap not found
+        response = e.response
+        if response is not None and response.status_code == 404 and response.url == sitemap_url:
             return [base_url.rstrip("/")]
-
-        response.raise_for_status()
-
-        # Parse XML content
-        root = ET.fromstring(response.content)
-
-        # Handle different XML namespaces that sitemaps might use
-        namespaces = (
-            {"ns": root.tag.split("}")[0].strip("{")} if "}" in root.tag else ""
-        )
-
-        # Extract URLs using namespace if present
-        if namespaces:
-            urls = [elem.text for elem in root.findall(".//ns:loc", namespaces)]
-        else:
-            urls = [elem.text for elem in root.findall(".//loc")]
-
-        return urls
-
+        raise ValueError(f"Failed to fetch sitemap: {str(e)}")
     except requests.RequestException as e:
         raise ValueError(f"Failed to fetch sitemap: {str(e)}")
-    except ET.ParseError as e:
+    except (ET.ParseError, EOFError, OSError) as e:
         raise ValueError(f"Failed to parse sitemap XML: {str(e)}")
     except Exception as e:
         raise ValueError(f"Unexpected error processing sitemap: {str(e)}")
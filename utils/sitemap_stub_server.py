@@ -0,0 +1,131 @@
+import argparse
+import gzip
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+
+class _SitemapHandler(BaseHTTPRequestHandler):
+    """Small site with a sitemap index, a plain and a gzipped sitemap.
+
+    Pages of the plain sitemap carry <lastmod>, pages of the gzipped one do
+    not and are checked with HEAD. ETags are derived from the served
+    content, so sitemaps and pages answer If-None-Match with 304 until
+    their content changes; bump a version in ``versions`` to simulate an
+    edit (a page of the plain sitemap also changes its <lastmod>, and with
+    it the sitemap).
+    """
+
+    pages: int = 5
+    gzipped_pages: int = 5
+    versions: Dict[str, int] = {}
+    fail: set = set()
+
+    def _base(self) -> str:
+        return f"http://{self.headers['Host']}"
+
+    @staticmethod
+    def _etag(body: bytes) -> str:
+        return f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+
+    def _urlset(self, paths, lastmod: bool) -> bytes:
+        entries = []
+        for path in paths:
+            date = f"<lastmod>2026-01-{self.versions.get(path, 1):02d}</lastmod>" if lastmod else ""
+            entries.append(f"<url><loc>{self._base()}{path}</loc>{date}</url>")
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            + "".join(entries)
+            + "</urlset>"
+        ).encode("utf-8")
+
+    def _body(self, path: str):
+        if path == "/sitemap.xml":
+            return (
+                '<?xml version="1.0" encoding="UTF-8"?>'
+                '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                f"<sitemap><loc>{self._base()}/sitemap-pages.xml</loc></sitemap>"
+                f"<sitemap><loc>{self._base()}/sitemap-more.xml.gz</loc></sitemap>"
+                "</sitemapindex>"
+            ).encode("utf-8"), "application/xml"
+        if path == "/sitemap-pages.xml":
+            paths = [f"/page/{i}" for i in range(self.pages)]
+            return self._urlset(paths, lastmod=True), "application/xml"
+        if path == "/sitemap-more.xml.gz":
+            paths = [f"/more/{i}" for i in range(self.gzipped_pages)]
+            # mtime=0 keeps the gzip bytes, and so the ETag, stable
+            return gzip.compress(self._urlset(paths, lastmod=False), mtime=0), "application/gzip"
+        if path.startswith(("/page/", "/more/")):
+            html = f"<html><body><h1>{path}</h1><p>v{self.versions.get(path, 1)}</p></body></html>"
+            return html.encode("utf-8"), "text/html; charset=utf-8"
+        return None, None
+
+    def _respond(self, with_body: bool) -> None:
+        body, content_type = self._body(self.path)
+        if body is None or self.path in self.fail:
+            self.send_response(404 if body is None else 500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        etag = self._etag(body)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        if with_body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond(with_body=True)
+
+    def do_HEAD(self):
+        self._respond(with_body=False)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(
+    host: str = "127.0.0.1", port: int = 8767, pages: int = 5, gzipped_pages: int = 5
+) -> ThreadingHTTPServer:
+    """Creates a stub site; call serve_forever() on the result.
+
+    ``server.versions`` (path -> version) and ``server.fail`` (paths that
+    answer 500) can be changed while it runs.
+    """
+    handler = type(
+        "SitemapHandler",
+        (_SitemapHandler,),
+        {"pages": pages, "gzipped_pages": gzipped_pages, "versions": {}, "fail": set()},
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.versions = handler.versions
+    server.fail = handler.fail
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальный сайт с sitemap для проверки краулера")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--pages", type=int, default=5, help="Страниц в обычном sitemap")
+    parser.add_argument("--gzipped-pages", type=int, default=5, help="Страниц в sitemap .xml.gz")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.pages, args.gzipped_pages)
+    print(f"✅ Тестовый сайт: python 1-extraction.py --sitemap http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,165 @@
+import re
+from dataclasses import replace
+from typing import Iterable, Iterator, List, Tuple
+
+from utils.chunks import ChunkRecord
+
+# Input limit of text-embedding-3-small is 8191 tokens, keep a margin
+EMBEDDING_MAX_TOKENS = 8000
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+
+class TokenLimiter:
+    """Splits texts that exceed a token budget at paragraph or sentence boundaries.
+
+    Used by both chunkers before embedding, so that every chunk fits into the
+    embedding model input on the first try. Tokens are counted with the same
+    tiktoken encoding as utils.tokenizer.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = EMBEDDING_MAX_TOKENS,
+        overlap_tokens: int = 100,
+        tokenizer=None,
+    ):
+        """Initialize the limiter.
+
+        Args:
+            max_tokens: Maximum number of tokens per piece
+            overlap_tokens: Tokens of trailing context repeated at the start of the next piece
+            tokenizer: OpenAITokenizerWrapper (created on demand if omitted)
+        """
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+
+        if tokenizer is None:
+            from utils.tokenizer import OpenAITokenizerWrapper
+
+            tokenizer = OpenAITokenizerWrapper(max_length=max_tokens)
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def count(self, text: str) -> int:
+        return self.tokenizer.count_tokens(text)
+
+    def _units(self, text: str, budget: int) -> List[Tuple[str, str]]:
+        """Breaks text into paragraphs, then sentences, then token slices that fit.
+
+        Returns:
+            (separator, unit) pairs; the separator restores the original joint
+        """
+        units = []
+        for paragraph in _PARAGRAPH_BREAK.split(text):
+            if not paragraph.strip():
+                continue
+            if self.count(paragraph) <= budget:
+                units.append(("\n\n", paragraph))
+                continue
+            separator = "\n\n"
+            for sentence in _SENTENCE_END.split(paragraph):
+                if self.count(sentence) <= budget:
+                    units.append((separator, sentence))
+                else:
+                    # A single sentence over the limit: cut it by tokens
+                    for i, piece in enumerate(self._cut_tokens(sentence, budget)):
+                        units.append((separator if i == 0 else "", piece))
+                separator = " "
+        return units
+
+    def _cut_tokens(self, text: str, budget: int) -> List[str]:
+        """Cuts text into slices of at most budget tokens between whole characters.
+
+        Byte-level BPE can split one character across tokens (often in
+        Cyrillic), and decoding half of it gives U+FFFD. A cut is only made
+        before a token that starts a character, moving it back if needed.
+        """
+        token_bytes = self.tokenizer.tokenizer.decode_tokens_bytes(self.tokenizer.encode(text))
+        # UTF-8 continuation bytes are 10xxxxxx: a cut before such a token splits a character
+        clean = [not token or token[0] & 0xC0 != 0x80 for token in token_bytes]
+        clean.append(True)
+
+        pieces = []
+        start = 0
+        while start < len(token_bytes):
+            end = min(start + budget, len(token_bytes))
+            while end > start and not clean[end]:
+                end -= 1
+            if end == start:
+                # One character spans more than budget tokens: keep it whole
+                end = start + budget
+                while not clean[end]:
+                    end += 1
+            pieces.append(b"".join(token_bytes[start:end]).decode("utf-8"))
+            start = end
+        return pieces
+
+    @staticmethod
+    def _join(units: List[Tuple[str, str]]) -> str:
+        return units[0][1] + "".join(separator + unit for separator, unit in units[1:])
+
+    def split(self, text: str, header: str = "") -> List[str]:
+        """Splits text into pieces of at most max_tokens tokens.
+
+        Args:
+            text: Text to split
+            header: Heading repeated at the start of every continuation piece
+
+        Returns:
+            [text] if it already fits, otherwise the pieces in order
+        """
+        if self.count(text) <= self.max_tokens:
+            return [text]
+
+        prefix = f"{header}\n\n" if header else ""
+        budget = self.max_tokens - self.count(prefix) - self.overlap_tokens
+        if budget <= 0:
+            raise ValueError("max_tokens is too small for the header and overlap")
+
+        pieces: List[str] = []
+        current: List[Tuple[str, str]] = []
+        current_tokens = 0
+
+        for separator, unit in self._units(text, budget):
+            # Count the joint as well, "\n\n" is a token of its own
+            unit_tokens = self.count(separator + unit)
+            if current and current_tokens + unit_tokens > budget:
+                pieces.append(self._join(current))
+                current = self._overlap(current)
+                current_tokens = sum(self.count(sep + u) for sep, u in current)
+            current.append((separator, unit))
+            current_tokens += unit_tokens
+        if current:
+            pieces.append(self._join(current))
+
+        return [
+            piece if i == 0 or not prefix or piece.startswith(header) else prefix + piece
+            for i, piece in enumerate(pieces)
+        ]
+
+    def _overlap(self, units: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Trailing units of the previous piece that fit into overlap_tokens."""
+        tail: List[Tuple[str, str]] = []
+        tokens = 0
+        for separator, unit in reversed(units):
+            tokens += self.count(unit)
+            if tokens > self.overlap_tokens:
+                break
+            tail.insert(0, (separator, unit))
+        return tail
+
+    def split_records(self, records: Iterable[ChunkRecord]) -> Iterator[ChunkRecord]:
+        """Splits oversized ChunkRecords, renumbering chunk indexes per document.
+
+        Every piece keeps the document id, filename and heading path of its parent.
+        """
+        next_index = {}
+        for record in records:
+            for piece in self.split(record.text):
+                index = next_index.get(record.doc_id, 0)
+                next_index[record.doc_id] = index + 1
+                yield replace(record, index=index, text=piece)
+
@@ -0,0 +1,93 @@
+import gc
+import json
+import pathlib
+import time
+from dataclasses import dataclass
+from typing import Iterator
+
+
+@dataclass
+class WindowResult:
+    """A page window of a PDF that has been converted and written to disk."""
+
+    first_page: int
+    last_page: int
+    markdown_path: str
+    json_path: str
+    seconds: float
+
+
+def count_pages(pdf_path: str) -> int:
+    """Returns the number of pages of a PDF without rendering it."""
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(pdf_path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def convert_in_windows(
+    converter, pdf_path: str, output_dir: str, window_size: int = 50
+) -> Iterator[WindowResult]:
+    """Converts a PDF window by window, writing every window to disk as it is done.
+
+    Only one window of pages is held in memory at a time, so the peak memory
+    does not depend on the page count. Every window is written as a standalone
+    DoclingDocument JSON (usable by the chunkers right away) and as markdown;
+    the markdown is also appended to ``<stem>.md`` which grows into the full
+    document.
+
+    Args:
+        converter: docling DocumentConverter
+        pdf_path: Path to the PDF file
+        output_dir: Directory for the window files
+        window_size: Number of pages per window
+
+    Yields:
+        WindowResult for every window, in page order
+
+    Raises:
+        ValueError: If docling did not produce a document for a window
+    """
+    out = pathlib.Path(output_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    stem = pathlib.Path(pdf_path).stem
+    total_pages = count_pages(pdf_path)
+
+    combined_path = out / f"{stem}.md"
+    combined_path.write_text("", encoding="utf-8")
+
+    for first_page in range(1, total_pages + 1, window_size):
+        last_page = min(first_page + window_size - 1, total_pages)
+        started = time.perf_counter()
+
+        document = converter.convert(
+            pdf_path, page_range=(first_page, last_page)
+        ).document
+        if document is None:
+            raise ValueError(
+                f"Document was not produced for pages {first_page}-{last_page}"
+            )
+
+        window_stem = out / f"{stem}.p{first_page:04d}-{last_page:04d}"
+        markdown = document.export_to_markdown()
+        with open(f"{window_stem}.md", "w", encoding="utf-8") as f:
+            f.write(markdown)
+        with open(f"{window_stem}.json", "w", encoding="utf-8") as f:
+            json.dump(document.export_to_dict(), f, ensure_ascii=False)
+        with open(combined_path, "a", encoding="utf-8") as f:
+            f.write(markdown + "\n\n")
+
+        # Release the window before the next one is converted
+        del document, markdown
+        gc.collect()
+
+        yield WindowResult(
+            first_page=first_page,
+            last_page=last_page,
+            markdown_path=f"{window_stem}.md",
+            json_path=f"{window_stem}.json",
+            seconds=time.perf_counter() - started,
+        )
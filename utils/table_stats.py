@@ -0,0 +1,165 @@
+import json
+import os
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from utils.table_sync import _sql_list
+
+DEFAULT_CATALOG_PATH = "data/table_catalog.json"
+
+# Computed columns of the catalog scan: SQL projections, so vectors are never read.
+# length(text) does read the text column (only its length leaves the scan)
+STATS_COLUMNS = {
+    "doc_id": "doc_id",
+    "section": "section",
+    "title": "metadata.title",
+    "chars": "length(text)",
+    "ingested_at": "ingested_at",
+}
+
+
+def sample_rows(table, limit: int = 3, columns: Optional[List[str]] = None) -> List[Dict]:
+    """First rows of the table without the vector column."""
+    columns = columns or [name for name in table.schema.names if name != "vector"]
+    return table.search().select(columns).limit(limit).to_arrow().to_pylist()
+
+
+class TableCatalog:
+    """JSON catalog of per-document statistics of the chunks table.
+
+    Ingestion refreshes only the documents it changed, with a filtered,
+    column-projected read, so reports and UIs get row, section, title and
+    size counts without scanning the table or loading vectors.
+    """
+
+    def __init__(self, path: str = DEFAULT_CATALOG_PATH):
+        self.path = path
+        self.documents: Dict[str, Dict] = {}
+        self.vector_bytes_per_row = 0
+        self.updated_at: Optional[str] = None
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.documents = data["documents"]
+            self.vector_bytes_per_row = data["vector_bytes_per_row"]
+            self.updated_at = data["updated_at"]
+
+    def _collect(self, table, where: Optional[str] = None) -> Dict[str, Dict]:
+        search = table.search()
+        if where:
+            search = search.where(where)
+        rows = search.select(STATS_COLUMNS).limit(None).to_arrow().to_pylist()
+
+        grouped: Dict[str, List[Dict]] = {}
+        for row in rows:
+            grouped.setdefault(row["doc_id"], []).append(row)
+        return {
+            doc_id: {
+                "rows": len(doc_rows),
+                "text_chars": sum(row["chars"] or 0 for row in doc_rows),
+                "sections": dict(Counter(row["section"] for row in doc_rows)),
+                "titles": sorted({row["title"] for row in doc_rows if row["title"]}),
+                "last_ingested": max(row["ingested_at"] for row in doc_rows).isoformat(),
+            }
+            for doc_id, doc_rows in grouped.items()
+        }
+
+    def _touch(self, table) -> None:
+        vector = table.schema.field("vector").type
+        self.vector_bytes_per_row = vector.list_size * vector.value_type.bit_width // 8
+        self.updated_at = datetime.now(timezone.utc).isoformat()
+
+    def refresh(
+        self, table, doc_ids: Iterable[str], corpus_doc_ids: Optional[List[str]] = None
+    ) -> None:
+        """Recomputes the entries of changed documents.
+
+        Args:
+            table: LanceDB chunks table
+            doc_ids: Documents whose rows were written or deleted
+            corpus_doc_ids: All documents of the corpus; the others are dropped
+        """
+        doc_ids = list(doc_ids)
+        if doc_ids:
+            collected = self._collect(table, f"doc_id IN ({_sql_list(doc_ids)})")
+            for doc_id in doc_ids:
+                if doc_id in collected:
+                    self.documents[doc_id] = collected[doc_id]
+                else:
+                    self.documents.pop(doc_id, None)
+        if corpus_doc_ids is not None:
+            corpus = set(corpus_doc_ids)
+            for doc_id in [doc_id for doc_id in self.documents if doc_id not in corpus]:
+                del self.documents[doc_id]
+        self._touch(table)
+
+    def rebuild(self, table) -> None:
+        """Recomputes the whole catalog with one projected scan."""
+        self.documents = self._collect(table)
+        self._touch(table)
+
+    def is_current(self, table) -> bool:
+        """Whether the catalog matches the row count of the table (a cheap metadata call)."""
+        return self.updated_at is not None and self.total_rows == table.count_rows()
+
+    @property
+    def total_rows(self) -> int:
+        return sum(entry["rows"] for entry in self.documents.values())
+
+    def summary(self) -> Dict:
+        """Table-wide totals."""
+        entries = self.documents.values()
+        rows = self.total_rows
+        return {
+            "rows": rows,
+            "documents": len(self.documents),
+            "sections": sum(len(entry["sections"]) for entry in entries),
+            "titles": sorted({title for entry in entries for title in entry["titles"]}),
+            "text_chars": sum(entry["text_chars"] for entry in entries),
+            "vector_bytes": rows * self.vector_bytes_per_row,
+            "last_ingested": max((entry["last_ingested"] for entry in entries), default=None),
+        }
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "vector_bytes_per_row": self.vector_bytes_per_row,
+                    "updated_at": self.updated_at,
+                    "documents": self.documents,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_path, self.path)
+
+
+def load_catalog(table, path: str = DEFAULT_CATALOG_PATH) -> TableCatalog:
+    """Catalog of the table, rebuilt (and saved) if it is missing or out of date."""
+    catalog = TableCatalog(path)
+    if not catalog.is_current(table):
+        catalog.rebuild(table)
+        catalog.save()
+    return catalog
+
+
+def update_catalog(
+    table,
+    doc_ids: Iterable[str],
+    corpus_doc_ids: Optional[List[str]] = None,
+    path: str = DEFAULT_CATALOG_PATH,
+) -> TableCatalog:
+    """Refreshes the changed documents after ingestion and saves the catalog.
+
+    A catalog that still disagrees with the table afterwards (written before
+    it existed, or by another table) is rebuilt.
+    """
+    catalog = TableCatalog(path)
+    catalog.refresh(table, doc_ids, corpus_doc_ids)
+    if not catalog.is_current(table):
+        catalog.rebuild(table)
+    catalog.save()
+    return catalog
@@ -0,0 +1,144 @@
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set
+
+import pyarrow as pa
+
+
+def stable_chunk_id(doc_id: str, content_hash: str) -> str:
+    """Row id that stays the same as long as the chunk text of a document does."""
+    return hashlib.sha256(f"{doc_id}\0{content_hash}".encode("utf-8")).hexdigest()
+
+
+def _sql_list(values: Iterable[str]) -> str:
+    return ", ".join("'" + value.replace("'", "''") + "'" for value in values)
+
+
+@dataclass
+class SyncReport:
+    unchanged: int = 0
+    upserted: int = 0
+    deleted: int = 0
+    removed_documents: int = 0
+
+
+class TableSync:
+    """Keeps a LanceDB table in step with the current chunks of a corpus.
+
+    Rows are identified by ``stable_chunk_id``, so an unchanged chunk keeps
+    its row and is neither re-embedded nor rewritten. A chunk whose text is
+    unchanged but whose ``meta_hash`` differs (renamed heading, new position
+    or duplicate set) is rewritten too. New and changed chunks
+    are written with merge-insert on ``id``; rows whose chunk disappeared
+    from a synced document, or whose document left the corpus, are deleted.
+    The amount of work is proportional to the change, not to the corpus.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.report = SyncReport()
+        self._existing: Set[str] = set()
+        self._seen: Set[str] = set()
+        # Documents with written or deleted rows, for TableCatalog.refresh()
+        self.changed_doc_ids: Set[str] = set()
+        # plan() may be called from several ingest threads
+        self._lock = threading.Lock()
+
+    def existing_ids(self, doc_ids: List[str]) -> Set[str]:
+        """Ids of rows that already exist for the given documents."""
+        return set(self._existing_rows(doc_ids, with_meta=False))
+
+    def _existing_rows(self, doc_ids: List[str], with_meta: bool) -> Dict[str, Optional[str]]:
+        if not doc_ids:
+            return {}
+        rows = (
+            self.table.search()
+            .where(f"doc_id IN ({_sql_list(doc_ids)})")
+            .select(["id", "meta_hash"] if with_meta else ["id"])
+            .limit(None)
+            .to_arrow()
+        )
+        meta = rows.column("meta_hash").to_pylist() if with_meta else [None] * rows.num_rows
+        return dict(zip(rows.column("id").to_pylist(), meta))
+
+    def plan(
+        self, doc_ids: List[str], ids: List[str], meta_hashes: Optional[List[str]] = None
+    ) -> List[int]:
+        """Registers the current chunk ids and returns the positions that need writing.
+
+        Args:
+            doc_ids: Documents being synced
+            ids: Stable ids of all current chunks of those documents
+            meta_hashes: metadata_hash() of every chunk; rows whose stored hash
+                differs are rewritten as well
+
+        Returns:
+            Indexes into ``ids`` of chunks that are not in the table yet or
+            whose metadata changed
+        """
+        existing = self._existing_rows(doc_ids, with_meta=meta_hashes is not None)
+        pending = [
+            i
+            for i, chunk_id in enumerate(ids)
+            if chunk_id not in existing
+            or (meta_hashes is not None and existing[chunk_id] != meta_hashes[i])
+        ]
+        with self._lock:
+            self._existing.update(existing)
+            self._seen.update(ids)
+            self.report.unchanged += len(ids) - len(pending)
+            if pending or set(existing) - set(ids):
+                self.changed_doc_ids.update(doc_ids)
+        return pending
+
+    def upsert(self, rows: List[dict]) -> None:
+        """Writes new or changed rows; each row must have an ``id``."""
+        if not rows:
+            return
+        # merge_insert does not cast plain rows to the table schema, and the
+        # inferred one (all columns nullable) is rejected by non-null columns
+        data = pa.Table.from_pylist(rows, schema=self.table.schema)
+        (
+            self.table.merge_insert("id")
+            .when_matched_update_all()
+            .when_not_matched_insert_all()
+            .execute(data)
+        )
+        self.report.upserted += len(rows)
+
+    def finish(self, corpus_doc_ids: List[str], optimize: bool = True) -> SyncReport:
+        """Deletes stale rows and compacts the table.
+
+        Args:
+            corpus_doc_ids: All documents currently in the corpus
+            optimize: Compact fragments and prune old versions afterwards
+
+        Returns:
+            What the sync changed
+        """
+        stale = self._existing - self._seen
+        if stale:
+            self.table.delete(f"id IN ({_sql_list(stale)})")
+            self.report.deleted += len(stale)
+
+        outside = (
+            f"doc_id NOT IN ({_sql_list(corpus_doc_ids)})" if corpus_doc_ids else "true"
+        )
+        gone = (
+            self.table.search()
+            .where(outside)
+            .select(["doc_id"])
+            .limit(None)
+            .to_arrow()
+            .column("doc_id")
+            .to_pylist()
+        )
+        if gone:
+            self.table.delete(outside)
+            self.report.deleted += len(gone)
+            self.report.removed_documents += len(set(gone))
+
+        if optimize and (self.report.upserted or self.report.deleted):
+            self.table.optimize()
+        return self.report
@@ -1,3 +1,4 @@
+from collections import OrderedDict
 from typing import Dict, List, Tuple
 
 from tiktoken import get_encoding
@@ -6,24 +7,121 @@ from transformers.tokenization_utils_base import PreTrainedTokenizerBase
 
 # Create a wrapper class to make OpenAI's tokenizer compatible with the HybridChunker interface
 class OpenAITokenizerWrapper(PreTrainedTokenizerBase):
-    """Minimal wrapper for OpenAI's tokenizer."""
+    """Minimal wrapper for OpenAI's tokenizer.
+
+    Besides the HuggingFace interface it offers a native path that works with
+    integer ids and plain counts (``encode``, ``count_tokens``,
+    ``count_tokens_batch``). Counts are memoized, because the chunker measures
+    the same overlapping spans of text again and again. The memo is keyed by
+    the hash and length of a text, not the text itself, so each entry takes a
+    few dozen bytes however long the span is.
+    """
 
     def __init__(
-        self, model_name: str = "cl100k_base", max_length: int = 1024, **kwargs
+        self,
+        model_name: str = "cl100k_base",
+        max_length: int = 1024,
+        cache_size: int = 65536,
+        **kwargs,
     ):
         """Initialize the tokenizer.
 
         Args:
             model_name: The name of the OpenAI encoding to use
             max_length: Maximum sequence length
+            cache_size: Number of memoized token counts (about 100 bytes each)
         """
         super().__init__(model_max_length=max_length, **kwargs)
         self.tokenizer = get_encoding(model_name)
         self._vocab_size = self.tokenizer.max_token_value
+        self._vocab = None
+        self._counts: "OrderedDict[Tuple[int, int], int]" = OrderedDict()
+        self._cache_size = cache_size
+
+    # ----------------------------------------------------------
+    # Native path: integer ids and counts
+    # ----------------------------------------------------------
+
+    def encode(self, text: str, *args, **kwargs) -> List[int]:
+        """Returns tiktoken ids directly, without the HuggingFace round trip."""
+        return self.tokenizer.encode_ordinary(text)
+
+    def encode_batch(self, texts: List[str]) -> List[List[int]]:
+        """Encodes many texts at once using tiktoken's threaded batch encoder."""
+        return self.tokenizer.encode_ordinary_batch(texts)
+
+    @staticmethod
+    def _key(text: str) -> Tuple[int, int]:
+        # str caches its hash, so repeated lookups of the same span are cheap
+        return hash(text), len(text)
+
+    def _remember(self, key: Tuple[int, int], count: int) -> int:
+        self._counts[key] = count
+        if len(self._counts) > self._cache_size:
+            self._counts.popitem(last=False)
+        return count
+
+    def count_tokens(self, text: str) -> int:
+        """Returns the number of tokens in text (memoized)."""
+        key = self._key(text)
+        count = self._counts.get(key)
+        if count is not None:
+            self._counts.move_to_end(key)
+            return count
+        return self._remember(key, len(self.tokenizer.encode_ordinary(text)))
+
+    def count_tokens_batch(self, texts: List[str]) -> List[int]:
+        """Returns token counts for many texts, encoding only unseen ones in one batch."""
+        counts: List[int] = [0] * len(texts)
+        missing: Dict[str, List[int]] = {}
+
+        for i, text in enumerate(texts):
+            key = self._key(text)
+            count = self._counts.get(key)
+            if count is None:
+                missing.setdefault(text, []).append(i)
+            else:
+                self._counts.move_to_end(key)
+                counts[i] = count
+
+        if missing:
+            unique = list(missing)
+            for text, ids in zip(unique, self.tokenizer.encode_ordinary_batch(unique)):
+                self._remember(self._key(text), len(ids))
+                for i in missing[text]:
+                    counts[i] = len(ids)
+        return counts
+
+    def chunker_tokenizer(self):
+        """Returns this tokenizer as a docling BaseTokenizer for HybridChunker.
+
+        HybridChunker then counts tokens through the memoized native path
+        instead of building a list of string tokens for every measurement.
+        """
+        from docling_core.transforms.chunker.tokenizer.base import BaseTokenizer
+
+        wrapper = self
+
+        class _ChunkerTokenizer(BaseTokenizer):
+            def count_tokens(self, text: str) -> int:
+                return wrapper.count_tokens(text)
+
+            def get_max_tokens(self) -> int:
+                return wrapper.model_max_length
+
+            def get_tokenizer(self):
+                # semchunk accepts a plain token counter
+                return wrapper.count_tokens
+
+        return _ChunkerTokenizer()
+
+    # ----------------------------------------------------------
+    # HuggingFace interface
+    # ----------------------------------------------------------
 
     def tokenize(self, text: str, **kwargs) -> List[str]:
         """Main method used by HybridChunker."""
-        return [str(t) for t in self.tokenizer.encode(text)]
+        return [str(t) for t in self.tokenizer.encode_ordinary(text)]
 
     def _tokenize(self, text: str) -> List[str]:
         return self.tokenize(text)
@@ -34,8 +132,15 @@ class OpenAITokenizerWrapper(PreTrainedTokenizerBase):
     def _convert_id_to_token(self, index: int) -> str:
         return str(index)
 
+    def convert_tokens_to_ids(self, tokens):
+        if isinstance(tokens, str):
+            return int(tokens)
+        return [int(t) for t in tokens]
+
     def get_vocab(self) -> Dict[str, int]:
-        return dict(enumerate(range(self.vocab_size)))
+        if self._vocab is None:
+            self._vocab = dict(enumerate(range(self.vocab_size)))
+        return self._vocab
 
     @property
     def vocab_size(self) -> int:
@@ -51,3 +156,45 @@ class OpenAITokenizerWrapper(PreTrainedTokenizerBase):
 
     def __len__(self):
         return self.vocab_size
+
+
+if __name__ == "__main__":
+    # Micro-benchmark: token counting over overlapping windows, as the chunker does it
+    import sys
+    import time
+
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = "Этап квалификации клиента и синхронизация терминов. " * 4000
+
+    paragraphs = [p for p in text.split("\n") if p.strip()] or [text]
+    windows = [
+        "\n".join(paragraphs[i : i + width])
+        for width in (1, 2, 4, 8)
+        for i in range(len(paragraphs))
+    ]
+
+    wrapper = OpenAITokenizerWrapper()
+
+    def legacy_count(span: str) -> int:
+        # Previous path: ids -> str tokens -> ids again
+        return len(wrapper.convert_tokens_to_ids(wrapper.tokenize(span)))
+
+    for name, count in (
+        ("tokenize() + str->id", legacy_count),
+        ("count_tokens()", wrapper.count_tokens),
+    ):
+        started = time.perf_counter()
+        for _ in range(3):
+            total = sum(count(span) for span in windows)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<24} {elapsed * 1000:8.1f} ms  ({total} tokens)")
+
+    wrapper = OpenAITokenizerWrapper()
+    started = time.perf_counter()
+    total = sum(wrapper.count_tokens_batch(windows))
+    elapsed = time.perf_counter() - started
+    print(f"{'count_tokens_batch()':<24} {elapsed * 1000:8.1f} ms  ({total} tokens, cold)")
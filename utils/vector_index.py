@@ -0,0 +1,187 @@
+import math
+import os
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+
+INDEX_TYPES = ("none", "ivf_pq", "ivf_hnsw_sq")
+VECTOR_DTYPES = {"float32": pa.float32(), "float16": pa.float16()}
+# PQ codebooks are trained on 256 centroids per sub-vector
+MIN_ROWS_FOR_INDEX = 256
+
+# Filterable columns of the chunks table and the scalar index type of each.
+# All of them have many distinct values (documents, nearly unique heading paths,
+# pages, timestamps), so BTREE; BITMAP would only suit low-cardinality columns
+SCALAR_INDEXES = {
+    "doc_id": "BTREE",
+    "section": "BTREE",
+    "page_start": "BTREE",
+    "page_end": "BTREE",
+    "ingested_at": "BTREE",
+}
+
+# Full-text (BM25) index on chunk texts: Russian stemming and stop words,
+# so "продажах" finds "продажи" and filler words do not dilute the ranking
+TEXT_COLUMN = "text"
+TEXT_INDEX_OPTIONS = {"language": "Russian", "stem": True, "remove_stop_words": True}
+
+
+def vector_dtype(name: Optional[str] = None) -> pa.DataType:
+    """Arrow type of stored vectors: the argument or VECTOR_DTYPE (float32 | float16).
+
+    Raises:
+        ValueError: If the type is not supported
+    """
+    name = (name or os.getenv("VECTOR_DTYPE") or "float32").lower()
+    if name not in VECTOR_DTYPES:
+        raise ValueError(f"Unsupported vector dtype: {name} (expected one of {tuple(VECTOR_DTYPES)})")
+    return VECTOR_DTYPES[name]
+
+
+def index_params(num_rows: int, dims: int, index_type: str = "ivf_pq") -> Dict:
+    """Picks index parameters for the table size and vector size.
+
+    About sqrt(rows) IVF partitions keep every partition a few hundred to a
+    few thousand rows. PQ uses sub-vectors of 8 to 16 dimensions, which must
+    divide the vector size.
+    """
+    params = {"num_partitions": max(1, min(int(math.sqrt(num_rows)), num_rows // 64 or 1))}
+    if index_type == "ivf_pq":
+        for width in (16, 8, 4, 2, 1):
+            if dims % width == 0:
+                params["num_sub_vectors"] = dims // width
+                break
+    return params
+
+
+def create_vector_index(table, index_type: str = "ivf_pq", metric: str = "l2") -> Optional[Dict]:
+    """Builds (or replaces) a quantized ANN index on the vector column.
+
+    ``ivf_pq`` compresses vectors with product quantization, ``ivf_hnsw_sq``
+    quantizes them to int8 and searches HNSW graphs inside each partition.
+    Queries can rescore the candidates on the stored vectors with
+    ``refine_factor``.
+
+    Args:
+        table: LanceDB table
+        index_type: One of INDEX_TYPES ("none" skips indexing)
+        metric: Distance type, must match the one used by queries
+
+    Returns:
+        Parameters of the built index, or None if none was built
+
+    Raises:
+        ValueError: If the index type is unknown
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type} (expected one of {INDEX_TYPES})")
+
+    num_rows = table.count_rows()
+    if index_type == "none" or num_rows < MIN_ROWS_FOR_INDEX:
+        return None
+
+    dims = table.schema.field("vector").type.list_size
+    params = index_params(num_rows, dims, index_type)
+    table.create_index(
+        metric=metric, index_type=index_type.upper(), replace=True, **params
+    )
+    return params
+
+
+def _index_types(table) -> Dict[str, str]:
+    """Index type of every single-column index, e.g. {"doc_id": "BTREE"}."""
+    return {
+        index.columns[0]: index.index_type.upper()
+        for index in table.list_indices()
+        if len(index.columns) == 1
+    }
+
+
+def create_scalar_indexes(table, replace: bool = False) -> List[str]:
+    """Builds the missing scalar indexes on the filterable columns.
+
+    Prefiltered vector search then resolves the filter from the index
+    instead of scanning every row. Existing indexes are kept: new rows are
+    added to them by ``table.optimize()``. An index of another type than
+    SCALAR_INDEXES asks for is rebuilt.
+
+    Args:
+        table: LanceDB table
+        replace: Rebuild every index, not only the missing ones
+
+    Returns:
+        Names of the columns indexed by this call
+    """
+    existing = _index_types(table)
+    built = []
+    for column, index_type in SCALAR_INDEXES.items():
+        if column not in table.schema.names:
+            continue
+        if not replace and existing.get(column) == index_type:
+            continue
+        table.create_scalar_index(column, index_type=index_type, replace=True)
+        built.append(column)
+    return built
+
+
+def create_text_index(table, replace: bool = False) -> bool:
+    """Builds the native full-text index on the text column if it is missing.
+
+    An existing index is kept: ``table.optimize()`` adds new rows to it
+    instead of re-tokenizing the whole table.
+
+    Args:
+        table: LanceDB table
+        replace: Rebuild the index even if it exists
+
+    Returns:
+        True if the index was built by this call
+    """
+    if TEXT_COLUMN not in table.schema.names:
+        return False
+    if not replace and _index_types(table).get(TEXT_COLUMN) == "FTS":
+        return False
+    table.create_fts_index(TEXT_COLUMN, use_tantivy=False, replace=True, **TEXT_INDEX_OPTIONS)
+    return True
+
+
+def vector_index_status(table) -> Optional[Dict]:
+    """Type and coverage of the vector index, or None if the table has none."""
+    for index in table.list_indices():
+        if "vector" in index.columns:
+            stats = table.index_stats(index.name)
+            return {
+                "name": index.name,
+                "index_type": stats.index_type,
+                "distance_type": stats.distance_type,
+                "indexed_rows": stats.num_indexed_rows,
+                "unindexed_rows": stats.num_unindexed_rows,
+            }
+    return None
+
+
+def maintain_vector_index(
+    table, index_type: str = "ivf_pq", rebuild_ratio: float = 0.2
+) -> str:
+    """Keeps the vector index in step with the table.
+
+    New rows are searched by brute force until they are indexed. When they
+    are a small share of the table, ``optimize()`` adds them to the existing
+    partitions; once they exceed ``rebuild_ratio`` of the indexed rows the
+    partitions no longer fit the data and the index is rebuilt with
+    parameters for the current size.
+
+    Returns:
+        "built", "rebuilt", "updated", "up to date" or "skipped" (table too small)
+    """
+    status = vector_index_status(table)
+    if status is None:
+        return "built" if create_vector_index(table, index_type) else "skipped"
+    if status["unindexed_rows"] == 0:
+        return "up to date"
+    if status["unindexed_rows"] > rebuild_ratio * max(status["indexed_rows"], 1):
+        current = status["index_type"].lower()
+        create_vector_index(table, current if current in INDEX_TYPES else index_type)
+        return "rebuilt"
+    table.optimize()
+    return "updated"